@@ -0,0 +1,534 @@
+import os
+import pickle
+import shutil
+import struct
+
+import numpy as np
+import pytest
+
+from scanmsupport.scanm import scanm_global, scanm_hdf5, scanm_smh
+from scanmsupport.scanm.scanm_catalog import SMHCatalog, scm_read_catalog_entry
+from scanmsupport.scanm.scanm_hdf5 import SMPHDF5, scm_save_hdf5
+from scanmsupport.scanm.scanm_smh_cache import SMHCache
+from scanmsupport.scanm.scanm_smp import SMP
+
+__filepath_chirp = os.path.join(
+    os.path.dirname(__file__), "..", "..", "scanmsupport", "data", "M1_LR_GCL4_chirp.smp"
+)
+
+__filepath_chirp_h5 = os.path.join(
+    os.path.dirname(__file__), "..", "..", "scanmsupport", "data", "SMP_M1_LR_GCL4_chirp.h5"
+)
+
+
+def load_file(filepath, **kwargs):
+    scmf = SMP()
+    assert scmf.loadSMH(filepath, verbose=False) == 0, "SMH not loaded"
+    assert scmf.loadSMP(**kwargs) == 0, "SMP not loaded"
+    return scmf
+
+
+def read_header_lines(fPath):
+    # Reference decoding of the header lines, the way `loadSMH` used to do it
+    kvl = []
+    with open(fPath, "rt", encoding="ISO-8859-1") as f:
+        f.seek(64)
+        for ln in iter(f.readline, ""):
+            buf = ln.encode("utf-8")
+            tmp = ""
+            ich = -1
+            for j in range((len(buf) - 1) // 2):
+                if buf[ich + 1] == 0:
+                    ich += 2
+                    tmp += chr(buf[ich])
+                else:
+                    ich += 3
+                    tmp = tmp[:-1] + chr(buf[ich - 2]) + chr(buf[ich])
+            s = tmp.split("\n")[0]
+            if len(s) > 0 and s[0] != "\x00":
+                kvl.append(s)
+    return kvl
+
+
+def read_pixel_buffer(filepath, iPixB, nAICh, pixBLen):
+    # Reference decoding of one pixel buffer, the way the loader used to do it
+    npx = nAICh * pixBLen
+    with open(filepath, "rb") as f:
+        f.seek(iPixB * npx * 2)
+        buf = np.array(struct.unpack(f"{npx}H", f.read(npx * 2)))
+    return buf.reshape(nAICh, pixBLen)
+
+
+def write_header_copy(fPath, addLines=(), **values):
+    # Copy of the chirp header w/ the values of the keys in `values` replaced
+    # and the key-value pair lines `addLines` inserted before the header length
+    scmf_h = SMP()
+    scmf_h.loadSMH(__filepath_chirp)
+    lines = []
+    for s in scanm_global.scm_read_header_lines(__filepath_chirp[:-4] + ".smh"):
+        sKey = scanm_global.scm_get_entry_key(s)
+        lines.append(scanm_global.scm_set_entry_value(s, values[sKey]) if sKey in values else s)
+    lines[-2:-2] = addLines
+    scanm_global.scm_write_header(fPath + ".smh", scmf_h._SMHPreHdrDict, lines)
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp), reason="File not found")
+def test_load_chirp_file():
+    scmf = load_file(__filepath_chirp)
+    assert scmf.nFr == 1112
+    pixBLen = scmf.pixBufLenList[0]
+    for iPixB in [0, 1, 1000, 2223]:
+        ref = read_pixel_buffer(__filepath_chirp, iPixB, 3, pixBLen)
+        for iCh in range(3):
+            data = scmf.getData(ch=iCh)
+            assert data.shape == (1112, 64, 80)
+            assert data.dtype == np.uint16
+            assert np.array_equal(data.reshape(-1)[iPixB * pixBLen:(iPixB + 1) * pixBLen], ref[iCh])
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp), reason="File not found")
+def test_load_chirp_file_mmap():
+    scmf = load_file(__filepath_chirp)
+    scmf_map = load_file(__filepath_chirp, mmap=True)
+    for iCh in range(3):
+        data = scmf.getData(ch=iCh, crop=True)
+        data_map = scmf_map.getData(ch=iCh, crop=True)
+        assert data_map.shape == data.shape
+        assert np.array_equal(np.asarray(data_map), data)
+        assert np.array_equal(data_map[100], data[100])
+        assert np.array_equal(data_map[3:700:7, 10:50, 2], data[3:700:7, 10:50, 2])
+        assert np.array_equal(np.copy(data_map[:, :, :2]), data[:, :, :2])
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp), reason="File not found")
+def test_load_chirp_file_channels():
+    scmf = load_file(__filepath_chirp)
+    for mmap in [False, True]:
+        scmf_sel = load_file(__filepath_chirp, mmap=mmap, channels=[0, 2])
+        assert scmf_sel.channels == [0, 2]
+        assert scmf_sel.getData(ch=1) is None
+        for iCh in [0, 2]:
+            assert np.array_equal(np.asarray(scmf_sel.getData(ch=iCh)), scmf.getData(ch=iCh))
+    # Channel subsets are read in blocks, also by several workers or ahead
+    for kwargs in [dict(workers=4), dict(readAhead=2), dict(frames=slice(100, 1000, 3))]:
+        scmf_sel = load_file(__filepath_chirp, channels=[2, 0], **kwargs)
+        assert scmf_sel.channels == [0, 2]
+        for iCh in [0, 2]:
+            assert np.array_equal(scmf_sel.getData(ch=iCh), scmf.getData(ch=iCh)[kwargs.get("frames", slice(None))])
+
+    scmf_err = SMP()
+    scmf_err.loadSMH(__filepath_chirp)
+    assert scmf_err.loadSMP(channels=[3]) != 0
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp), reason="File not found")
+def test_load_chirp_file_frames():
+    scmf = load_file(__filepath_chirp)
+    scmf_fr = SMP()
+    scmf_fr.loadSMH(__filepath_chirp)
+    for mmap in [False, True]:
+        for frames in [slice(0, 300), slice(100, 1112, 3), slice(-10, None)]:
+            assert scmf_fr.loadSMP(mmap=mmap, frames=frames) == 0
+            assert scmf_fr.frames == range(1112)[frames]
+            for iCh in range(3):
+                data = scmf.getData(ch=iCh, crop=True)[frames]
+                assert np.array_equal(np.asarray(scmf_fr.getData(ch=iCh, crop=True)), data)
+                assert np.array_equal(
+                    np.asarray(scmf_fr.getData(ch=iCh, crop=True, frames=slice(1, 3))), data[1:3]
+                )
+    assert scmf_fr.loadSMP(frames=slice(2000, 3000)) != 0
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp), reason="File not found")
+def test_iter_frames_chirp_file():
+    scmf = load_file(__filepath_chirp)
+    scmf_it = SMP()
+    scmf_it.loadSMH(__filepath_chirp)
+    for crop in [False, True]:
+        data = scmf.getData(ch=2, crop=crop)
+        iFrList = []
+        for iFr, block in scmf_it.iter_frames(ch=2, chunk=100, crop=crop):
+            assert len(block) <= 100
+            assert np.array_equal(block, data[iFr:iFr + len(block)])
+            iFrList.append(iFr)
+        assert iFrList == list(range(0, 1112, 100))
+    # Several AI channels at once
+    for iFr, block in scmf_it.iter_frames(ch=[0, 2], chunk=300):
+        assert block.shape[0] == 2
+        assert np.array_equal(block, scmf.getAllData(crop=True)[[0, 2], iFr:iFr + 300])
+    assert not scmf_it.isSMPReady
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp), reason="File not found")
+def test_load_chirp_file_workers():
+    scmf = load_file(__filepath_chirp)
+    for frames in [slice(None), slice(100, 1000, 3)]:
+        scmf_thr = load_file(__filepath_chirp, workers=4, frames=frames)
+        for iCh in range(3):
+            assert np.array_equal(scmf_thr.getData(ch=iCh), scmf.getData(ch=iCh)[frames])
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp), reason="File not found")
+def test_load_chirp_file_read_ahead():
+    scmf = load_file(__filepath_chirp)
+    for frames in [slice(None), slice(100, 1000, 3)]:
+        scmf_ra = load_file(__filepath_chirp, readAhead=2, frames=frames)
+        for iCh in range(3):
+            assert np.array_equal(scmf_ra.getData(ch=iCh), scmf.getData(ch=iCh)[frames])
+    assert scmf_ra.readStats["bytes"] > 0
+    assert scmf_ra.readStats["MBps"] > 0
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp), reason="File not found")
+def test_get_all_data_chirp_file(tmp_path):
+    scmf = load_file(__filepath_chirp)
+    stack = scmf.getAllData()
+    assert stack.shape == (3, 1112, 64, 80)
+    assert stack.flags["C_CONTIGUOUS"]
+    for iCh in range(3):
+        assert np.shares_memory(stack, scmf.getData(ch=iCh))
+    for kwargs in [dict(channels=[0, 2]), dict(channels=[0, 2], mmap=True)]:
+        scmf_sel = load_file(__filepath_chirp, **kwargs)
+        assert scmf_sel.channels == [0, 2]
+        sel = scmf_sel.getAllData(crop=True, frames=slice(10, 20))
+        assert sel.shape == (2, 10, 64, 64)
+        for i, iCh in enumerate([0, 2]):
+            assert np.array_equal(sel[i], scmf.getData(ch=iCh, crop=True)[10:20])
+
+    # No retrace
+    fPath = str(tmp_path / "noretrace")
+    write_header_copy(fPath, PixRetraceLen=0)
+    os.symlink(os.path.abspath(__filepath_chirp), fPath + ".smp")
+    for mmap in [False, True]:
+        scmf_nr = load_file(fPath, mmap=mmap)
+        errC, info = scmf_nr.probe()
+        assert info["croppedShape"] == (1112, 64, 74)
+        assert scmf_nr.getAllData(crop=True).shape == (3,) + info["croppedShape"]
+        assert scmf_nr.getData(ch=2, crop=True).shape == info["croppedShape"]
+        assert np.array_equal(scmf_nr.getData(ch=2, crop=True), stack[2, :, :, 6:])
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp), reason="File not found")
+def test_probe_chirp_file(tmp_path):
+    scmf = load_file(__filepath_chirp)
+    scmf_pr = SMP()
+    scmf_pr.loadSMH(__filepath_chirp)
+    errC, info = scmf_pr.probe()
+    assert errC == 0
+    assert not scmf_pr.isSMPReady
+    assert info["nFr"] == info["nFrInFile"] == scmf.nFr
+    assert scmf_pr.nFr == -1
+    assert info["channels"] == [0, 1, 2]
+    assert info["dtype"] == scmf.getData(ch=0).dtype
+    assert info["shape"] == scmf.getData(ch=0).shape
+    assert info["croppedShape"] == scmf.getData(ch=0, crop=True).shape
+    assert info["croppedBytesPerChannel"] == scmf.getData(ch=0, crop=True).nbytes
+    assert info["isComplete"]
+
+    # Truncated copy of the pixel data file
+    fPath = str(tmp_path / "truncated")
+    shutil.copy(__filepath_chirp[:-4] + ".smh", fPath + ".smh")
+    with open(__filepath_chirp, "rb") as fi, open(fPath + ".smp", "wb") as fo:
+        fo.write(fi.read(info["pixDataLen_byte"] // 2))
+    scmf_tr = SMP()
+    scmf_tr.loadSMH(fPath)
+    errC, info_tr = scmf_tr.probe()
+    assert errC != 0
+    assert not info_tr["isComplete"]
+    assert info_tr["nFrInFile"] == info["nFr"] // 2
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp), reason="File not found")
+def test_probe_xz_scan_mode(tmp_path):
+    fPath = str(tmp_path / "xz")
+    write_header_copy(fPath, ScanMode=scanm_global.ScM_scanMode_XZYImage)
+    os.symlink(os.path.abspath(__filepath_chirp), fPath + ".smp")
+
+    scmf_xz = SMP()
+    assert scmf_xz.loadSMH(fPath) == 0
+    assert scmf_xz.scanMode == scanm_global.ScM_scanMode_XZYImage
+    assert scmf_xz.probe() == (scanm_global.ERR_NotImplemented, None)
+    assert scmf_xz.describe() is None
+    assert scmf_xz._getPixDataLayout() == (scanm_global.ERR_NotImplemented, None)
+    assert scmf_xz.loadSMP() == scanm_global.ERR_NotImplemented
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp), reason="File not found")
+def test_header_decoding_chirp_file(monkeypatch):
+    fPathSMH = __filepath_chirp[:-4] + ".smh"
+    kvl = scanm_smh.scm_read_header_lines(fPathSMH)
+    assert kvl == read_header_lines(fPathSMH)
+    assert any("TargetedStimulusDuration_µs" in s for s in kvl)
+
+    scmf = SMP()
+    scmf.loadSMH(__filepath_chirp)
+    monkeypatch.setattr(scanm_smh, "scm_read_header_lines", read_header_lines)
+    scmf_ref = SMP()
+    scmf_ref.loadSMH(__filepath_chirp)
+    assert list(scmf._kvPairDict) == list(scmf_ref._kvPairDict)
+    assert pickle.dumps(scmf._kvPairDict) == pickle.dumps(scmf_ref._kvPairDict)
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp), reason="File not found")
+def test_header_cache_chirp_file(tmp_path, monkeypatch):
+    scmf = load_file(__filepath_chirp)
+    fPath = str(tmp_path / "chirp")
+    shutil.copy(__filepath_chirp[:-4] + ".smh", fPath + ".smh")
+    os.symlink(os.path.abspath(__filepath_chirp), fPath + ".smp")
+    cache = SMHCache(tmp_path / "cache")
+
+    scmf_c = SMP()
+    assert scmf_c.loadSMH(fPath, cache=cache) == 0
+    assert (cache.nHits, cache.nMisses) == (0, 1)
+
+    # Second load is taken from the cache w/o parsing the header
+    def fail(fPath):
+        raise AssertionError("Header parsed")
+    with monkeypatch.context() as m:
+        m.setattr(scanm_smh, "scm_read_header_lines", fail)
+        assert scmf_c.loadSMH(fPath, cache=cache) == 0
+    assert cache.nHits == 1
+    scmf_ref = SMP()
+    scmf_ref.loadSMH(fPath)
+    assert pickle.dumps(scmf_c._kvPairDict) == pickle.dumps(scmf_ref._kvPairDict)
+    assert scmf_c.loadSMP() == 0
+    assert np.array_equal(scmf_c.getData(ch=0), scmf.getData(ch=0))
+
+    # Changed header file is parsed again
+    os.utime(fPath + ".smh", ns=(0, 0))
+    assert scmf_c.loadSMH(fPath, cache=cache) == 0
+    assert cache.nMisses == 2
+
+    # Size-bounded eviction of least recently used entries
+    nEntry_bytes = os.path.getsize(os.path.join(cache.dirPath, os.listdir(cache.dirPath)[0]))
+    cache_s = SMHCache(tmp_path / "cache_s", maxSize_bytes=2 * nEntry_bytes + 100)
+    for i in range(4):
+        shutil.copy(fPath + ".smh", fPath + f"{i}.smh")
+        SMP().loadSMH(fPath + f"{i}", cache=cache_s)
+    assert len(os.listdir(cache_s.dirPath)) == 2
+    SMP().loadSMH(fPath + "3", cache=cache_s)
+    assert (cache_s.nHits, cache_s.nMisses) == (1, 4)
+
+    # Filling a cache does not scan it on every store
+    cache_m = SMHCache(tmp_path / "cache_m", maxSize_bytes=50 * nEntry_bytes + 100)
+    for i in range(200):
+        shutil.copy(fPath + ".smh", fPath + f"_m{i}.smh")
+        SMP().loadSMH(fPath + f"_m{i}", cache=cache_m)
+    nEntries = len(os.listdir(cache_m.dirPath))
+    assert 40 <= nEntries <= 50
+    assert cache_m.nScans <= 200 // 4
+    SMP().loadSMH(fPath + "_m199", cache=cache_m)
+    assert cache_m.nHits == 1
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp), reason="File not found")
+def test_header_record_chirp_file():
+    scmf = SMP()
+    scmf.loadSMH(__filepath_chirp)
+    hdr = scmf._hdr
+    assert isinstance(hdr, scanm_smh.SMHRecord)
+    assert not hasattr(hdr, "__dict__")
+    assert hdr.USER_dxPix == scmf.dxFr_pix == 80
+    assert len(hdr) == len(scmf._kvPairDict)
+    with pytest.raises(AttributeError):
+        hdr.USER_dxPix = 10
+
+    # Setting a value replaces the record
+    scmf.dyFrDec_pix = 32
+    assert scmf.dyFrDec_pix == 32 and scmf._hdr is not hdr
+    assert hdr.USER_dyFrDecoded == 64
+    assert scmf._hdr._layout is hdr._layout
+
+    # Array values cannot be changed in place
+    entries = scmf.get(scanm_global.SCMIO_keys.StimBufMapEntries)
+    with pytest.raises(ValueError):
+        entries[0, 0] = 1
+    a = np.zeros(3)
+    rec = scanm_smh.SMHRecord({"Values": [np.float64, 3, a]})
+    assert not rec.get("Values").flags.writeable and a.flags.writeable
+
+    hdr_p = pickle.loads(pickle.dumps(hdr))
+    assert pickle.dumps(hdr_p.toKVPairs()) == pickle.dumps(hdr.toKVPairs())
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp), reason="File not found")
+def test_catalog_chirp_file(tmp_path):
+    # Directory tree with copies of the header
+    for fPath in ["a/1/Raw/M1_chirp", "a/2/Raw/M1_chirp", "b/1/Raw/M2_DN"]:
+        os.makedirs(tmp_path / "data" / os.path.dirname(fPath))
+        shutil.copy(__filepath_chirp[:-4] + ".smh", tmp_path / "data" / (fPath + ".smh"))
+        os.symlink(os.path.abspath(__filepath_chirp), tmp_path / "data" / (fPath + ".smp"))
+    with open(tmp_path / "data" / "b" / "broken.smh", "wb") as f:
+        f.write(b"\x00" * 10)
+
+    with SMHCatalog(tmp_path / "catalog.db") as cat:
+        assert cat.update(tmp_path / "data", workers=2) == (4, 0, 0)
+        assert len(cat) == 4
+        rows = cat.query(
+            "name LIKE ? AND abs(zoom - ?) < 1e-6 AND nInputCh = ?", ("%chirp%", 0.87, 3)
+        )
+        assert [os.path.relpath(r["path"], tmp_path) for r in rows] == [
+            "data/a/1/Raw/M1_chirp.smh", "data/a/2/Raw/M1_chirp.smh"
+        ]
+        assert rows[0]["nFr"] == 1112 and rows[0]["isComplete"] == 1
+        assert rows[0]["dxFr_pix"] == 80 and rows[0]["scanPathFunc"].startswith("XYScan2|")
+        assert cat.query("error IS NOT NULL")[0]["name"] == "broken"
+
+    # Incremental update
+    with SMHCatalog(tmp_path / "catalog.db") as cat:
+        assert cat.update(tmp_path / "data", workers=1) == (0, 4, 0)
+        os.utime(tmp_path / "data" / "a" / "2" / "Raw" / "M1_chirp.smh", ns=(0, 0))
+        os.remove(tmp_path / "data" / "b" / "broken.smh")
+        assert cat.update(tmp_path / "data", workers=1) == (1, 2, 1)
+        assert len(cat) == 3
+
+    # Header of a scan mode w/o pixel data layout
+    fPath = str(tmp_path / "xz")
+    write_header_copy(fPath, ScanMode=scanm_global.ScM_scanMode_XZYImage)
+    os.symlink(os.path.abspath(__filepath_chirp), fPath + ".smp")
+    row = scm_read_catalog_entry(fPath + ".smh")
+    assert "not implemented" in row["error"]
+    assert row["scanModeStr"] == scanm_global.ScM_scanModeStr[scanm_global.ScM_scanMode_XZYImage]
+    assert row["dxFr_pix"] == 80 and abs(row["zoom"] - 0.87) < 1e-6 and row["GUID"] is not None
+    assert row["nFr"] is None
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp), reason="File not found")
+def test_write_header_chirp_file(tmp_path):
+    scmf = SMP()
+    scmf.loadSMH(__filepath_chirp)
+    lines = scanm_global.scm_read_header_lines(__filepath_chirp[:-4] + ".smh")
+
+    # Header length lines are found by key, not by position
+    lines_m = lines[-2:] + lines[:-2]
+    fPath = str(tmp_path / "moved")
+    d = scanm_global.scm_write_header(fPath + ".smh", scmf._SMHPreHdrDict, lines_m)
+    assert d["headerLen_byte"] == os.path.getsize(fPath + ".smh")
+    assert scanm_global.scm_read_header_lines(fPath + ".smh")[2:] == lines_m[2:]
+    scmf_m = SMP()
+    assert scmf_m.loadSMH(fPath) == 0
+    assert scmf_m.get(scanm_global.SCMIO_keys.HdrLenInValuePairs) == len(lines)
+
+    with pytest.raises(KeyError):
+        scanm_global.scm_write_header(str(tmp_path / "err.smh"), scmf._SMHPreHdrDict, lines[:-1])
+    assert not os.path.exists(tmp_path / "err.smh")
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp), reason="File not found")
+def test_save_reduced_chirp_file(tmp_path):
+    scmf = load_file(__filepath_chirp)
+    scmf_h = SMP()
+    scmf_h.loadSMH(__filepath_chirp)
+
+    # Unchanged copy
+    assert scmf_h.saveReduced(str(tmp_path / "copy")) == 0
+    scmf_c = load_file(str(tmp_path / "copy.smp"))
+    assert scmf_c.GUID != scmf.GUID
+    assert scmf_c._SMPPreHdrDict["GUID"] == scmf_c.GUID
+    assert pickle.dumps(scmf_c._kvPairDict) == pickle.dumps(scmf._kvPairDict)
+    with open(__filepath_chirp, "rb") as f1, open(tmp_path / "copy.smp", "rb") as f2:
+        assert f1.read()[:-64] == f2.read()[:-64]
+
+    # Only AI channel 2 and 500 frames
+    assert scmf_h.saveReduced(str(tmp_path / "red"), channels=[2], frames=slice(100, 600)) == 0
+    scmf_r = load_file(str(tmp_path / "red"))
+    assert scmf_r.channels == [2]
+    assert scmf_r.nFr == 500
+    assert np.array_equal(scmf_r.getData(ch=2), scmf.getData(ch=2)[100:600])
+    assert os.path.getsize(tmp_path / "red.smp") == 500 * 80 * 64 * 2 + 64
+    errC, info = scmf_r.probe()
+    assert errC == 0 and info["channels"] == [2]
+
+    # Header w/ pixel buffer counts, which the loader prefers over the frame counts
+    fPath = str(tmp_path / "pixbufs")
+    write_header_copy(fPath, addLines=["UINT32,NumberOfPixBufsSet=1500;", "UINT32,PixBufCounter=388;"])
+    os.symlink(os.path.abspath(__filepath_chirp), fPath + ".smp")
+    scmf_pb = SMP()
+    scmf_pb.loadSMH(fPath)
+    assert scmf_pb.saveReduced(str(tmp_path / "red_pb"), channels=[2], frames=slice(100, 600)) == 0
+    scmf_r = load_file(str(tmp_path / "red_pb"))
+    assert scmf_r.nPixBufsSet == 500 and scmf_r.pixBufCounter == 0
+    assert np.array_equal(scmf_r.getData(ch=2), scmf.getData(ch=2)[100:600])
+    assert scmf_r.probe()[0] == 0
+
+    assert scmf_h.saveReduced(str(tmp_path / "err"), channels=[3]) != 0
+    assert scmf_h.saveReduced(str(tmp_path / "err"), frames=slice(0, 100, 2)) != 0
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp), reason="File not found")
+def test_hdf5_chirp_file(tmp_path, monkeypatch):
+    pytest.importorskip("h5py")
+    scmf = load_file(__filepath_chirp)
+    scmf_h = SMP()
+    scmf_h.loadSMH(__filepath_chirp)
+
+    # All channels are read in one pass, in blocks aligned to the dataset chunks
+    blocks = []
+    iter_frames = SMP.iter_frames
+
+    def iter_frames_logged(self, ch=0, chunk=100, crop=True):
+        for iFr, block in iter_frames(self, ch=ch, chunk=chunk, crop=crop):
+            blocks.append((ch, iFr))
+            yield iFr, block
+    with monkeypatch.context() as m:
+        m.setattr(SMP, "iter_frames", iter_frames_logged)
+        assert scm_save_hdf5(scmf_h, tmp_path / "chirp.h5", compression="gzip", chunk=300) == 0
+    with SMPHDF5(tmp_path / "chirp.h5") as h5:
+        nFrPerChunk = h5.getData(0).chunks[2]
+    assert all(ch == [0, 1, 2] for ch, _ in blocks)
+    assert [iFr for _, iFr in blocks] == list(range(0, 1112, -(-300 // nFrPerChunk) * nFrPerChunk))
+    with SMPHDF5(tmp_path / "chirp.h5") as h5:
+        assert h5.channels == [0, 1, 2]
+        assert h5.GUID == scmf.GUID
+        assert h5.header["Zoom"] == scmf.zoom
+        assert list(h5.header["ScanPathFunc"]) == scmf.get(scanm_smh.SCMIO_keys.USER_scanPathFunc)
+        for ch in h5.channels:
+            ds = h5.getData(ch)
+            assert ds.shape == (64, 64, 1112) and ds.chunks[:2] == (64, 64)
+            assert np.array_equal(ds[:, :, 500:510], scmf.getData(ch=ch, crop=True)[500:510].transpose(2, 1, 0))
+        assert h5.getData(3) is None
+
+    assert scm_save_hdf5(scmf_h, tmp_path / "ch2.h5", channels=[2], crop=False) == 0
+    with SMPHDF5(tmp_path / "ch2.h5") as h5:
+        assert h5.channels == [2]
+        assert np.array_equal(h5.getData(2)[()], scmf.getData(ch=2, crop=False).transpose(2, 1, 0))
+    assert scm_save_hdf5(scmf_h, tmp_path / "err.h5", channels=[3]) != 0
+
+
+def test_hdf5_attributes(tmp_path):
+    h5py = pytest.importorskip("h5py")
+    with h5py.File(tmp_path / "attrs.h5", "w") as f:
+        for k, v, ref in [
+            ("mixed", [1, "a"], ["1", "a"]), ("none", [None, 1], ["None", "1"]),
+            ("strings", ["a", "b"], ["a", "b"]), ("numbers", [1, 2.5], [1, 2.5])
+        ]:
+            f.attrs[k] = scanm_hdf5._toAttr(v)
+            assert [x.decode() if isinstance(x, bytes) else x for x in f.attrs[k]] == ref
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp_h5), reason="File not found")
+def test_hdf5_igor_export():
+    pytest.importorskip("h5py")
+    scmf = load_file(__filepath_chirp)
+    with SMPHDF5(__filepath_chirp_h5) as h5:
+        assert h5.channels == [0, 1, 2]
+        assert np.array_equal(h5.getData(0)[:, :, :5], scmf.getData(ch=0, crop=True)[:5].transpose(2, 1, 0))
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp), reason="File not found")
+def test_trigger_events_chirp_file():
+    scmf = load_file(__filepath_chirp)
+    scmf_h = SMP()
+    scmf_h.loadSMH(__filepath_chirp)
+
+    events = scmf_h.getTriggerEvents(ch=2, threshold=20000)
+    assert list(events["frame"]) == [150, 189, 408, 447, 666, 705]
+    # Trigger onsets are the first pixels at or above the threshold
+    data = scmf.getData(ch=2, crop=False)
+    for fr, ln, px, t in events[["frame", "line", "pixel", "time_s"]]:
+        assert data[fr, ln, px] >= 20000 > data.reshape(-1)[((fr * 64 + ln) * 80 + px) - 1]
+        assert t == pytest.approx(((fr * 64 + ln) * 80 + px) * 25e-6)
+    # Independent of the block size; minimal gap between triggers
+    assert np.array_equal(scmf_h.getTriggerEvents(ch=2, chunk=7), events)
+    assert list(scmf_h.getTriggerEvents(ch=2, minGap_s=10)["frame"]) == [150, 408, 666]
+    assert scmf_h.getTriggerEvents(ch=3) is None
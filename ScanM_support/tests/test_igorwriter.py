@@ -0,0 +1,147 @@
+import io
+import os
+import struct
+
+import numpy as np
+import pytest
+
+import igorwriter
+
+
+def saved_bytes(wave):
+    b = io.BytesIO()
+    wave.save(b)
+    return b.getvalue()
+
+
+def test_save_noncontiguous():
+    a = np.arange(5 * 6 * 7, dtype=np.uint16).reshape(5, 6, 7)
+    for arr in [a, a.swapaxes(0, 2), a[:, 1:4, ::2]]:
+        ref = np.asfortranarray(arr)
+        assert saved_bytes(igorwriter.IgorWave(arr, name="w")) == \
+            saved_bytes(igorwriter.IgorWave(ref, name="w"))
+
+
+def test_save_unsupported_dtype(tmp_path):
+    with pytest.raises(TypeError):
+        igorwriter.IgorWave(np.array(["a"], dtype="U1"), name="w").save(tmp_path / "w.ibw")
+    assert not os.path.exists(tmp_path / "w.ibw")
+
+
+def test_open_writer():
+    a = np.arange(5 * 6 * 7, dtype=np.uint16).reshape(5, 6, 7).swapaxes(0, 2)
+    ref = saved_bytes(igorwriter.IgorWave(a, name="wDataCh0"))
+
+    # Item by item and in blocks
+    for step in [1, 3]:
+        b = io.BytesIO()
+        with igorwriter.IgorWave([], name="wDataCh0").open_writer(b, a.shape, a.dtype) as w:
+            for i in range(0, a.shape[-1], step):
+                w.append(a[..., i] if step == 1 else a[..., i:i + step])
+        assert w.n_written == a.shape[-1]
+        assert b.getvalue() == ref
+
+    w = igorwriter.IgorWave([], name="w").open_writer(io.BytesIO(), a.shape, a.dtype)
+    with pytest.raises(ValueError):
+        w.append(a[:, :2, :])
+    with pytest.raises(ValueError):
+        w.append(a.astype(np.int32))
+    w.append(a[..., :2])
+    with pytest.raises(ValueError):
+        w.close()
+
+
+def test_create_mmap(tmp_path):
+    a = np.arange(5 * 6 * 7, dtype=np.uint16).reshape(5, 6, 7).swapaxes(0, 2)
+    m = igorwriter.IgorWave.create_mmap(tmp_path / "w.ibw", a.shape, a.dtype, name="wDataCh0")
+    assert m.shape == a.shape and m.flags.f_contiguous
+    for i in range(a.shape[-1]):
+        m[:, :, i] = a[:, :, i]
+    m.flush()
+    del m
+    with open(tmp_path / "w.ibw", "rb") as f:
+        assert f.read() == saved_bytes(igorwriter.IgorWave(a, name="wDataCh0"))
+
+
+REPO_DIR = os.path.join(os.path.dirname(__file__), "..", "..")
+
+
+def test_load_bundled():
+    w = igorwriter.IgorWave.load(os.path.join(REPO_DIR, "processing_pypeline", "example_data", "Q0_Roi.ibw"))
+    assert w.name == "Roi" and w.array.shape == (64, 64) and w.array.dtype == np.float32
+    assert isinstance(w.array, np.memmap)
+
+    w = igorwriter.IgorWave.load(os.path.join(REPO_DIR, "Proper_wParamsNum.ibw"), mmap=False)
+    assert w.name == "wParamsNum" and w.array.shape == (60,)
+    assert w.dimension_labels[0][:2] == ["HdrLenInValuePairs", "HdrLenInBytes"]
+    assert len(w.dimension_labels[0]) == 60
+
+
+def test_load_round_trip(tmp_path):
+    a = np.arange(5 * 6 * 7, dtype=np.float64).reshape(5, 6, 7)
+    w = igorwriter.IgorWave(a, name="wDataCh0")
+    w.set_datascale("a very long data unit")
+    w.set_dimscale("x", 0, 0.5, "um")
+    w.save(tmp_path / "w.ibw")
+    for mmap in [True, False]:
+        r = igorwriter.IgorWave.load(tmp_path / "w.ibw", mmap=mmap)
+        assert np.array_equal(r.array, a)
+        assert r.name == "wDataCh0"
+        assert r.data_units == "a very long data unit"
+        assert r.dimension_units[0] == "um"
+        assert saved_bytes(r) == saved_bytes(w)
+
+    b = io.BytesIO(saved_bytes(w))
+    assert np.array_equal(igorwriter.IgorWave.load(b).array, a)
+    with pytest.raises(ValueError):
+        igorwriter.IgorWave.load(io.BytesIO(saved_bytes(w)[:100] + b"\x01" + saved_bytes(w)[101:]))
+
+
+def test_save_itx_values():
+    rng = np.random.default_rng(0)
+    a = rng.standard_normal((3, 4, 2))
+    for arr in [a, a.astype(np.float32), (a * 1000).astype(np.int16), a[..., 0] + 1j * a[..., 1]]:
+        b = io.StringIO()
+        igorwriter.IgorWave(arr, name="w").save_itx(b)
+        e = arr if arr.ndim == 3 else arr[..., np.newaxis]
+        if np.iscomplexobj(e):
+            rows = ["\t".join("%s\t%s" % (x.real, x.imag) for x in e[r, :, 0]) for r in range(e.shape[0])]
+            expected = "\n".join(rows) + "\n\n\n"
+        else:
+            expected = "".join(
+                "\n".join("\t".join(str(x) for x in e[r, :, l]) for r in range(e.shape[0])) + "\n\n"
+                for l in range(e.shape[2])
+            ) + "\n"
+        text = b.getvalue()
+        assert text[text.index("BEGIN\n") + 6:text.index("END\n")] == expected
+
+
+def test_save_text_and_labels():
+    w = igorwriter.IgorWave(np.array(["x", "C:\\a\\b", ""], dtype=object), name="wParamsStr")
+    w.set_dimensionlablels(["first", "", "third"])
+    r = igorwriter.IgorWave.load(io.BytesIO(saved_bytes(w)))
+    assert r.array.tolist() == ["x", "C:\\a\\b", ""]
+    assert r.dimension_labels == [["first", "", "third"]]
+
+
+def test_packed_experiment():
+    a = np.arange(5 * 6 * 7, dtype=np.uint16).reshape(5, 6, 7)
+    num = igorwriter.IgorWave(np.arange(4.0), name="wParamsNum")
+    num.set_dimensionlablels(["A", "B"])
+    b = io.BytesIO()
+    with igorwriter.IgorPackedExperiment(b) as pxp:
+        pxp.start_folder("M1_chirp")
+        pxp.save_wave(num)
+        with pxp.open_wave_writer(igorwriter.IgorWave([], name="wDataCh0"), a.shape, a.dtype) as w:
+            w.append(a)
+
+    # Records: type, version, number of data bytes, data
+    data, records = b.getvalue(), []
+    while data:
+        record_type, _, n = struct.unpack("<Hhi", data[:8])
+        records.append((record_type, data[8:8 + n]))
+        data = data[8 + n:]
+    assert [r[0] for r in records] == [9, 3, 3, 10]
+    assert records[0][1] == b"M1_chirp".ljust(32, b"\x00")
+    assert records[1][1] == saved_bytes(num)
+    assert np.array_equal(igorwriter.IgorWave.load(io.BytesIO(records[2][1])).array, a)
@@ -0,0 +1,36 @@
+import os
+import shutil
+
+import pytest
+
+import main
+
+__filepath_chirp = os.path.join(
+    os.path.dirname(__file__), "..", "..", "scanmsupport", "data", "M1_LR_GCL4_chirp.smp"
+)
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp), reason="File not found")
+def test_batch_filesize_reducer(tmp_path, capsys):
+    # Two copies of the recording and one w/ truncated pixel data
+    for name in ["good1", "good2"]:
+        shutil.copy(__filepath_chirp[:-4] + ".smh", tmp_path / (name + ".smh"))
+        os.symlink(os.path.abspath(__filepath_chirp), tmp_path / (name + ".smp"))
+    shutil.copy(__filepath_chirp[:-4] + ".smh", tmp_path / "truncated.smh")
+    with open(__filepath_chirp, "rb") as fi, open(tmp_path / "truncated.smp", "wb") as fo:
+        fo.write(fi.read(os.path.getsize(__filepath_chirp) // 2))
+
+    need = main.estimate_peak_memory(tmp_path / "good1.smp")
+    with pytest.raises(ValueError):
+        main.estimate_peak_memory(tmp_path / "truncated.smp")
+
+    # The budget only fits one recording at a time
+    results = main.batch_filesize_reducer(str(tmp_path), memory_budget=need, max_workers=2)
+    good = [str(tmp_path / "good1.smp"), str(tmp_path / "good2.smp")]
+    assert results[good[0]] is None and results[good[1]] is None
+    assert "truncated" in results[str(tmp_path / "truncated.smp")]
+    for path in good:
+        assert os.path.isfile(os.path.join(path[:-4], "wDataCh2.ibw"))
+    events = [ln.split()[0] for ln in capsys.readouterr().out.splitlines()
+              if ln.startswith(("Starting", "Finished"))]
+    assert events == ["Starting", "Finished", "Starting", "Finished"]
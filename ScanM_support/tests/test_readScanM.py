@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+import pytest
+
+import processing_pypeline.readScanM as rsm
+from scanmsupport.scanm.scanm_smp import SMP
+
+__filepath_chirp = os.path.join(
+    os.path.dirname(__file__), "..", "..", "scanmsupport", "data", "M1_LR_GCL4_chirp"
+)
+
+
+def reference_edges(data, level, release, gap):
+    # Line by line Schmitt trigger
+    state, last, edges = 0, None, []
+    for i, m in enumerate(data.reshape(-1, data.shape[2]).max(axis=1)):
+        new = 1 if m >= level else (0 if m < release else state)
+        if new and not state and (last is None or i - last >= gap):
+            edges.append(i)
+            last = i
+        state = new
+    return edges
+
+
+def test_trigger_edges():
+    data = np.random.default_rng(0).integers(0, 100, (300, 4, 5))
+    for level, release, gap in [(95, 95, 0), (98, 60, 0), (98, 60, 7)]:
+        frames, lines, n_frames = rsm.trigger_edges(data, level, release, gap)
+        assert n_frames == 300
+        assert list(frames * 4 + lines) == reference_edges(data, level, release, gap)
+        # Streamed in blocks and frame by frame
+        for blocks in [(data[i:i + 7] for i in range(0, 300, 7)), iter(data)]:
+            f, l, n = rsm.trigger_edges(blocks, level, release, gap)
+            assert np.array_equal(f, frames) and np.array_equal(l, lines) and n == 300
+
+
+def test_trigger_detection():
+    data = np.zeros((20, 4, 5), dtype=np.int16)
+    # Triggers spanning two frames count once
+    for fr, ln in [(2, 3), (3, 0), (8, 1), (14, 2)]:
+        data[fr, ln, 1] = 300
+    indexes, trig_array = rsm.trigger_detection(data, triggerLevel=220)
+    assert indexes == [2, 8, 14]
+    assert list(np.flatnonzero(trig_array)) == [2, 8, 14] and len(trig_array) == 20
+    assert rsm.trigger_detection(data, triggerLevel=220, triggerMode=2)[0] == [2, 14]
+    assert rsm.trigger_detection(data, triggerLevel=220, minGap=30)[0] == [2, 14]
+
+
+@pytest.mark.skipif(not os.path.isfile(__filepath_chirp + ".smp"), reason="File not found")
+def test_read_in_data_chirp_file():
+    scmf = SMP()
+    assert scmf.loadSMH(__filepath_chirp + ".smh") == 0 and scmf.loadSMP() == 0
+    header = rsm.read_in_header(__filepath_chirp + ".smh")
+    for mmap in [False, True]:
+        output = rsm.read_in_data(__filepath_chirp + ".smp", header, readChan1=True, readChan3=True, mmap=mmap)
+        assert sorted(output) == ["chan1", "chan3"]
+        for key, ch in [("chan1", 0), ("chan3", 2)]:
+            assert output[key].dtype == np.uint16
+            frames = rsm.to_frame(output[key], frameTotal=1500, frameCounter=388, frameBuffer=1,
+                                  frameHeight=64, frameWidth=80)
+            assert np.array_equal(frames, scmf.getData(ch=ch))
@@ -12,6 +12,7 @@ MAXDIMS = 4
 MAX_WAVE_NAME2 = 18  # Maximum length of wave name in version 1 and 2 files. Does not include the trailing null.
 MAX_WAVE_NAME5 = 31  # Maximum length of wave name in version 5 files. Does not include the trailing null.
 MAX_UNIT_CHARS = 3
+MAX_DIM_LABEL_CHARS = 31  # Maximum length of a dimension label. Does not include the trailing null.
 
 ENCODING = locale.getpreferredencoding()
 
@@ -29,6 +30,14 @@ TYPES = {
     np.complex128: 4 + 1,
     np.object_: '/T',
 }
+# record types of packed experiment files
+WAVE_RECORD = 3
+DATA_FOLDER_START_RECORD = 9
+DATA_FOLDER_END_RECORD = 10
+
+# number of values formatted at once by save_itx
+ITX_BLOCK_ITEMS = 2 ** 16
+
 ITX_TYPES = {
     np.bool_: '/B',
     np.int8: '/B',
@@ -120,6 +129,15 @@ class WaveHeader5(ctypes.Structure):
         self.sfA = (1,) * MAXDIMS
 
 
+class PackedFileRecordHeader(ctypes.Structure):
+    _pack_ = 2
+    _fields_ = [
+        ('recordType', ctypes.c_uint16),  # Record type plus superceded flag.
+        ('version', ctypes.c_int16),  # Version information depends on the type of record.
+        ('numDataBytes', ctypes.c_int32),  # Number of data bytes in the record following this record header.
+    ]
+
+
 class IgorWave5(object):
     def __init__(self, array, name='wave0', on_errors='fix'):
         """
@@ -213,37 +231,137 @@ class IgorWave5(object):
 
         :param file: file name or binary-file object.
         :param image: if True, rows and columns are transposed."""
-        a = self._check_array(image=image)
-
-        self._wave_header.npnts = len(a.ravel())
-        self._wave_header.type = TYPES[a.dtype.type]
-
-        self._wave_header.nDim = a.shape + (0,) * (MAXDIMS - a.ndim)
-
-        self._bin_header.wfmSize = 320 + a.nbytes
-
-        # checksum
-        first384bytes = (bytearray(self._bin_header) + bytearray(self._wave_header))[:384]
-        self._bin_header.checksum -= sum(struct.unpack('@192h', first384bytes))
-
+        prepared = self._prepare_save(image=image)
         fp = file if hasattr(file, 'write') else open(file, mode='wb')
         fp.seek(0, os.SEEK_END)
         if fp.tell() > 0:
             raise ValueError('You can only save() into an empty file.')
         try:
-            fp.write(self._bin_header)
-            fp.write(self._wave_header)
-            fp.write(a.tobytes(order='F'))
-
-            fp.write(self._extended_data_units)
-            for u in self._extended_dimension_units:
-                fp.write(u)
-            for label in self._dimension_labels:
-                fp.write(label)
+            self._write(fp, prepared)
         finally:
             if fp is not file:
                 fp.close()
 
+    def _prepare_save(self, image=False):
+        # array (encoded strings and their end offsets for text waves) and headers for save
+        a = self._check_array(image=image)
+        if a.dtype.type is np.object_:
+            strings = [str(x).encode(ENCODING) for x in a.ravel(order='F')]
+            ends = np.cumsum([len(b) for b in strings], dtype=np.int32)
+            self._set_headers(a.shape, a.dtype, text_size=int(ends[-1]) if len(ends) else 0)
+            return a, b''.join(strings), ends
+        self._set_headers(a.shape, a.dtype)
+        return a, None, None
+
+    def _write(self, fp, prepared):
+        a, text, ends = prepared
+        fp.write(self._bin_header)
+        fp.write(self._wave_header)
+        if text is None:
+            _write_fortran(fp, a)
+        else:
+            fp.write(text)
+        self._write_trailer(fp, string_indices=ends)
+
+    def open_writer(self, file, shape, dtype):
+        """open a streaming writer for a wave of known shape and dtype.
+
+        The headers are written right away; the data is then appended chunk by
+        chunk along the last dimension (e.g. frame by frame for an (x, y, frame)
+        wave) with `append`, and `close` finalises the file. The array of the
+        wave itself is ignored.
+
+        :param file: file name or binary-file object (need not be seekable).
+        :param shape: shape of the complete wave.
+        :param dtype: numpy dtype of the wave.
+        :return: IgorWaveWriter"""
+        return IgorWaveWriter(self, file, shape, dtype)
+
+    @classmethod
+    def create_mmap(cls, path, shape, dtype, name='wave0', on_errors='fix'):
+        """create an igor binary wave (.ibw) file and return its data as memory map.
+
+        The headers are written up front and the file is extended to its final
+        size; the returned `np.memmap` is the data section in Igor's column-major
+        (Fortran) layout, so data can be written directly into the file, e.g.
+        frame by frame into an (x, y, frame) wave:
+
+            m = IgorWave.create_mmap('wDataCh0.ibw', (nx, ny, nfr), np.uint16, 'wDataCh0')
+            for i, block in smp.iter_frames(ch=0):
+                m[:, :, i:i + len(block)] = block.swapaxes(0, 2)
+            m.flush()
+
+        :param path: file name.
+        :param shape: shape of the wave.
+        :param dtype: numpy dtype of the wave.
+        :param name: wave name
+        :param on_errors: behavior when invalid name is given. 'fix': fix errors. 'raise': raise exception.
+        :return: np.memmap"""
+        shape = tuple(int(n) for n in shape)
+        dtype = np.dtype(dtype)
+        if dtype.type not in TYPES or dtype.type is np.object_:
+            raise TypeError('Unsupported dtype: %r' % dtype.type)
+        if not 1 <= len(shape) <= 4:
+            raise ValueError('Dimension of more than 4 is not supported.')
+        wave = cls([], name=name, on_errors=on_errors)
+        wave._set_headers(shape, dtype)
+        offset = ctypes.sizeof(wave._bin_header) + ctypes.sizeof(wave._wave_header)
+        with open(path, mode='wb') as fp:
+            fp.write(wave._bin_header)
+            fp.write(wave._wave_header)
+            fp.truncate(offset + int(np.prod(shape)) * dtype.itemsize)
+        return np.memmap(path, dtype=dtype, mode='r+', offset=offset, shape=shape, order='F')
+
+    def _set_headers(self, shape, dtype, text_size=None):
+        self._wave_header.npnts = int(np.prod(shape))
+        self._wave_header.nDim = tuple(shape) + (0,) * (MAXDIMS - len(shape))
+
+        if dtype.type is np.object_:
+            # text wave: the strings one after the other, and their end offsets
+            self._wave_header.type = 0
+            self._bin_header.wfmSize = 320 + text_size
+            self._bin_header.sIndicesSize = 4 * int(np.prod(shape))
+        else:
+            self._wave_header.type = TYPES[dtype.type]
+            self._bin_header.wfmSize = 320 + int(np.prod(shape)) * dtype.itemsize
+            self._bin_header.sIndicesSize = 0
+
+        # labels of the rows, each null-padded to 32 bytes and preceded by the
+        # label of the dimension itself
+        self._dimension_label_bytes = b''
+        if any(self._dimension_labels):
+            labels = [''] + list(self._dimension_labels[:shape[0]])
+            labels += [''] * (shape[0] + 1 - len(labels))
+            self._dimension_label_bytes = b''.join(
+                str(label).encode(ENCODING)[:MAX_DIM_LABEL_CHARS].ljust(MAX_DIM_LABEL_CHARS + 1, b'\x00')
+                for label in labels
+            )
+        self._bin_header.dimLabelsSize = (len(self._dimension_label_bytes),) + (0,) * (MAXDIMS - 1)
+        # dependency formula, wave note and options are not written
+        self._bin_header.formulaSize = 0
+        self._bin_header.noteSize = 0
+        self._bin_header.optionsSize1 = 0
+        self._bin_header.optionsSize2 = 0
+
+        # checksum
+        self._bin_header.checksum = 0
+        first384bytes = (bytearray(self._bin_header) + bytearray(self._wave_header))[:384]
+        self._bin_header.checksum = -sum(struct.unpack('@192h', first384bytes))
+
+    def _write_trailer(self, fp, string_indices=None):
+        fp.write(self._extended_data_units)
+        for u in self._extended_dimension_units:
+            fp.write(u)
+        fp.write(self._dimension_label_bytes)
+        if string_indices is not None:
+            fp.write(string_indices.astype('=i4').tobytes())
+
+    def _file_size(self):
+        # size of the .ibw file as given by the headers
+        h = self._bin_header
+        return (ctypes.sizeof(h) + h.wfmSize + h.formulaSize + h.noteSize + h.dataEUnitsSize
+                + sum(h.dimEUnitsSize) + sum(h.dimLabelsSize) + h.sIndicesSize + h.optionsSize1 + h.optionsSize2)
+
     def save_itx(self, file, image=False):
         """save data as igor text (.itx) format.
 
@@ -262,19 +380,15 @@ class IgorWave5(object):
                 name=name
             ))
             fp.write('BEGIN\n')
-            if np.iscomplexobj(array):
-                def str_(x):
-                    return '%s\t%s' % (x.real, x.imag)
-            else:
-                str_ = str
             # write in column/row/layer/chunk order
             expanded = array
             while expanded.ndim < 4:
                 expanded = np.expand_dims(expanded, expanded.ndim)
+            n_rows = max(1, ITX_BLOCK_ITEMS // max(1, expanded.shape[1]))
             for chunk in range(expanded.shape[3]):
                 for layer in range(expanded.shape[2]):
-                    for row in range(expanded.shape[0]):
-                        fp.write('\t'.join(str_(x) for x in expanded[row, :, layer, chunk]))
+                    for row in range(0, expanded.shape[0], n_rows):
+                        fp.write(_format_itx_block(expanded[row:row + n_rows, :, layer, chunk]))
                         fp.write('\n')
                     fp.write('\n')
                 fp.write('\n')
@@ -332,12 +446,316 @@ class IgorWave5(object):
                     raise TypeError('Cast from %r to %r failed.' % (type_, to_))
         return self.array
 
-    @staticmethod
-    def load(self, file):
-        raise NotImplementedError
+    @property
+    def data_units(self):
+        """units of the data."""
+        return (self._wave_header.dataUnits or self._extended_data_units).decode(ENCODING)
+
+    @property
+    def dimension_units(self):
+        """units of each dimension."""
+        return [
+            (bytes(self._wave_header.dimUnits[i]).rstrip(b'\x00') or self._extended_dimension_units[i]).decode(ENCODING)
+            for i in range(MAXDIMS)
+        ]
+
+    @classmethod
+    def load(cls, file, mmap=True):
+        """load igor binary wave (.ibw) format, version 5.
+
+        With `mmap`, the data of a numeric wave given by file name is not read but
+        memory-mapped (read-only, in Igor's column-major layout); otherwise, and
+        for text waves, it is read into memory. Dimension labels are available as
+        `dimension_labels` (one list of element labels per dimension, those of the
+        rows also for `save_itx`) and `dimension_names`, the wave note as `note`.
+
+        :param file: file name or binary-file object.
+        :param mmap: if True, memory-map the data.
+        :return: IgorWave5"""
+        fp = file if hasattr(file, 'read') else open(file, mode='rb')
+        try:
+            start = fp.tell()
+            buf = fp.read(ctypes.sizeof(BinHeader5) + ctypes.sizeof(WaveHeader5))
+            if len(buf) < 384:
+                raise ValueError('File too short for an igor binary wave.')
+            version = struct.unpack('<h', buf[:2])[0]
+            if version != 5:
+                if struct.unpack('>h', buf[:2])[0] == 5:
+                    raise ValueError('Big-endian igor binary waves are not supported.')
+                raise ValueError('Unsupported igor binary wave version %d.' % version)
+            if sum(struct.unpack('<192h', buf)) & 0xFFFF:
+                raise ValueError('Checksum error in igor binary wave header.')
+            bin_header = BinHeader5.from_buffer_copy(buf[:64])
+            wave_header = WaveHeader5.from_buffer_copy(buf[64:])
+
+            shape = []
+            for n in wave_header.nDim:
+                if n == 0:
+                    break
+                shape.append(n)
+            shape = tuple(shape) or (wave_header.npnts,)
+            data_bytes = bin_header.wfmSize - ctypes.sizeof(WaveHeader5)
+            if wave_header.type == 0:
+                # text wave, strings are stored one after the other
+                dtype = None
+            else:
+                dtype = np.dtype({v: k for k, v in TYPES.items() if k is not np.object_}[wave_header.type])
+                if dtype.itemsize * wave_header.npnts != data_bytes:
+                    raise ValueError('Size of wave data does not match its shape.')
+
+            if dtype is not None and mmap and fp is not file and wave_header.npnts > 0:
+                array = np.memmap(file, dtype=dtype, mode='r', offset=start + 384, shape=shape, order='F')
+                fp.seek(data_bytes, os.SEEK_CUR)
+            else:
+                data = fp.read(data_bytes)
+                if dtype is not None:
+                    array = np.frombuffer(data, dtype=dtype).reshape(shape, order='F')
+
+            formula = fp.read(bin_header.formulaSize)
+            note = fp.read(bin_header.noteSize)
+            extended_data_units = fp.read(bin_header.dataEUnitsSize)
+            extended_dimension_units = [fp.read(n) for n in bin_header.dimEUnitsSize]
+            dimension_labels = []
+            dimension_names = []
+            for i, n in enumerate(bin_header.dimLabelsSize):
+                raw = fp.read(n)
+                labels = [raw[j:j + 32].split(b'\x00', 1)[0].decode(ENCODING) for j in range(0, n, 32)]
+                if i < len(shape):
+                    dimension_names.append(labels[0] if labels else '')
+                    dimension_labels.append(labels[1:])
+            if dtype is None:
+                ends = struct.unpack('<%di' % wave_header.npnts, fp.read(bin_header.sIndicesSize))
+                array = np.array(
+                    [data[b:e].decode(ENCODING) for b, e in zip((0,) + ends[:-1], ends)], dtype=object
+                ).reshape(shape, order='F')
+        finally:
+            if fp is not file:
+                fp.close()
+
+        wave = cls.__new__(cls)
+        wave._bin_header = bin_header
+        wave._wave_header = wave_header
+        wave.array = array
+        wave._extended_data_units = extended_data_units
+        wave._extended_dimension_units = extended_dimension_units
+        wave._dimension_labels = dimension_labels[0] if dimension_labels else []
+        wave.dimension_labels = dimension_labels
+        wave.dimension_names = dimension_names
+        wave.formula = formula.rstrip(b'\x00').decode(ENCODING)
+        wave.note = note.decode(ENCODING)
+        return wave
 
     def __repr__(self):
         return '<IgorWave \'%s\' at %s>' % (self.name, hex(id(self)))
 
 
+class IgorWaveWriter(object):
+    def __init__(self, wave, file, shape, dtype, check_empty=True):
+        """Streaming writer for igor binary wave (.ibw) files, see `IgorWave5.open_writer`.
+
+        :param wave: IgorWave5 that provides name, scales, units and labels.
+        :param file: file name or binary-file object.
+        :param shape: shape of the complete wave.
+        :param dtype: numpy dtype of the wave.
+        :param check_empty: if True, a seekable file must be empty.
+        """
+        self._wave = wave
+        self._shape = tuple(int(n) for n in shape)
+        self._dtype = np.dtype(dtype)
+        if self._dtype.type not in TYPES or self._dtype.type is np.object_:
+            raise TypeError('Unsupported dtype: %r' % self._dtype.type)
+        if not 1 <= len(self._shape) <= 4:
+            raise ValueError('Dimension of more than 4 is not supported.')
+        self._n_written = 0
+        self._fp = file if hasattr(file, 'write') else open(file, mode='wb')
+        self._owns_fp = self._fp is not file
+        try:
+            if check_empty and self._fp.seekable():
+                self._fp.seek(0, os.SEEK_END)
+                if self._fp.tell() > 0:
+                    raise ValueError('You can only save() into an empty file.')
+            wave._set_headers(self._shape, self._dtype)
+            self._fp.write(wave._bin_header)
+            self._fp.write(wave._wave_header)
+        except BaseException:
+            if self._owns_fp:
+                self._fp.close()
+            raise
+
+    @property
+    def n_written(self):
+        """number of items written along the last dimension."""
+        return self._n_written
+
+    def append(self, chunk):
+        """append data along the last dimension.
+
+        :param chunk: array_like with the shape of the wave except for the last
+            dimension (a block of items), or without the last dimension (one item)."""
+        c = np.asarray(chunk)
+        if c.dtype != self._dtype:
+            raise ValueError('Chunk dtype %r differs from %r.' % (c.dtype, self._dtype))
+        if c.shape == self._shape[:-1]:
+            c = c[..., np.newaxis]
+        if c.shape[:-1] != self._shape[:-1]:
+            raise ValueError('Chunk shape %r does not fit %r.' % (c.shape, self._shape))
+        if self._n_written + c.shape[-1] > self._shape[-1]:
+            raise ValueError('More data than the wave shape %r.' % (self._shape,))
+        _write_fortran(self._fp, c)
+        self._n_written += c.shape[-1]
+
+    def close(self):
+        """write the trailing sections and close the file (if opened by the writer)."""
+        if self._fp is None:
+            return
+        try:
+            if self._n_written != self._shape[-1]:
+                raise ValueError('%d of %d items written.' % (self._n_written, self._shape[-1]))
+            self._wave._write_trailer(self._fp)
+        finally:
+            if self._owns_fp:
+                self._fp.close()
+            self._fp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif self._owns_fp:
+            self._fp.close()
+            self._fp = None
+
+
+class IgorPackedExperiment(object):
+    def __init__(self, file):
+        """Writer for igor packed experiment (.pxp) files.
+
+        A packed experiment is a sequence of records, each preceded by a record
+        header with its type and size. Waves are stored as complete igor binary
+        waves, data folders by a start and an end record around their contents.
+        Records are written one after the other as they are added, so the file
+        need not be seekable and only one wave is in memory at a time:
+
+            with IgorPackedExperiment('M1_chirp.pxp') as pxp:
+                pxp.start_folder('M1_chirp')
+                pxp.save_wave(wParamsNum)
+                with pxp.open_wave_writer(wDataCh0, (nx, ny, nfr), np.uint16) as w:
+                    for _, block in smp.iter_frames(ch=0):
+                        w.append(block.swapaxes(0, 2))
+
+        :param file: file name or binary-file object.
+        """
+        self._fp = file if hasattr(file, 'write') else open(file, mode='wb')
+        self._owns_fp = self._fp is not file
+        self._n_folders = 0
+        self._writer = None
+
+    def _write_record_header(self, record_type, n_bytes):
+        if self._fp is None:
+            raise ValueError('Packed experiment is closed.')
+        if self._writer is not None and self._writer._fp is not None:
+            raise ValueError('Close the writer of the previous wave first.')
+        header = PackedFileRecordHeader()
+        header.recordType = record_type
+        header.numDataBytes = n_bytes
+        self._fp.write(header)
+
+    def start_folder(self, name, on_errors='fix'):
+        """start a data folder; the following waves and folders are stored in it.
+
+        :param name: data folder name.
+        :param on_errors: behavior when invalid name is given. 'fix': fix errors. 'raise': raise exception.
+        """
+        bname = validator.check_and_encode(name, on_errors=on_errors)
+        self._write_record_header(DATA_FOLDER_START_RECORD, MAX_WAVE_NAME5 + 1)
+        self._fp.write(bname.ljust(MAX_WAVE_NAME5 + 1, b'\x00'))
+        self._n_folders += 1
+
+    def end_folder(self):
+        """end the current data folder."""
+        if self._n_folders == 0:
+            raise ValueError('No data folder to end.')
+        self._write_record_header(DATA_FOLDER_END_RECORD, 0)
+        self._n_folders -= 1
+
+    def save_wave(self, wave, image=False):
+        """add a wave to the current data folder.
+
+        :param wave: IgorWave5 with its array.
+        :param image: if True, rows and columns are transposed."""
+        prepared = wave._prepare_save(image=image)
+        self._write_record_header(WAVE_RECORD, wave._file_size())
+        wave._write(self._fp, prepared)
+
+    def open_wave_writer(self, wave, shape, dtype):
+        """add a wave of known shape and dtype to the current data folder, whose data
+        is appended chunk by chunk (see `IgorWave5.open_writer`); the writer must
+        be closed before further records are added.
+
+        :param wave: IgorWave5 that provides name, scales, units and labels.
+        :param shape: shape of the complete wave.
+        :param dtype: numpy dtype of the wave.
+        :return: IgorWaveWriter"""
+        shape = tuple(int(n) for n in shape)
+        dtype = np.dtype(dtype)
+        if dtype.type not in TYPES or dtype.type is np.object_:
+            raise TypeError('Unsupported dtype: %r' % dtype.type)
+        wave._set_headers(shape, dtype)
+        self._write_record_header(WAVE_RECORD, wave._file_size())
+        self._writer = IgorWaveWriter(wave, self._fp, shape, dtype, check_empty=False)
+        return self._writer
+
+    def close(self):
+        """end open data folders and close the file (if opened by the writer)."""
+        if self._fp is None:
+            return
+        try:
+            while self._n_folders > 0:
+                self.end_folder()
+        finally:
+            if self._owns_fp:
+                self._fp.close()
+            self._fp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif self._owns_fp:
+            self._fp.close()
+            self._fp = None
+
+
+def _format_itx_block(a):
+    """format 2d array as igor text, one row of tab-separated values per line.
+
+    The block is formatted by a single string template, giving the same text as
+    `str` of each value; complex values are written as real and imaginary part.
+
+    :param a: 2d array.
+    :return: str without trailing newline"""
+    if np.iscomplexobj(a):
+        a = np.stack((a.real, a.imag), axis=-1).reshape(a.shape[0], -1)
+    if a.dtype.type is np.float32:
+        # python floats are double precision, their text would have more digits
+        a = a.astype(str)
+    row = '\t'.join(['%s'] * a.shape[1])
+    return '\n'.join([row] * a.shape[0]) % tuple(a.ravel().tolist())
+
+
+def _write_fortran(fp, a, block_bytes=2**24):
+    # write array in Fortran order without a copy of the whole array:
+    # Fortran-contiguous arrays directly, others in blocks along the last dimension
+    if a.flags.f_contiguous:
+        fp.write(memoryview(a.T))
+        return
+    n = max(1, block_bytes // max(1, a[..., :1].nbytes))
+    for i in range(0, a.shape[-1], n):
+        fp.write(memoryview(np.asfortranarray(a[..., i:i + n]).T))
+
+
 IgorWave = IgorWave5
@@ -5,7 +5,9 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
 import os
+import glob
 import pathlib
+import concurrent.futures
 import processing_pypeline.readScanM as rsm
 #import napari
 import igorwriter
@@ -48,7 +50,7 @@ def pull_labels_and_clean(path):
     labels = np.where(labels == "nan", "", labels).tolist()
     return labels
 
-def load_Igor(path):
+def load_Igor(path, channels=None):
     """
     Load data from an Igor Pro file using the SMP class.
 
@@ -56,6 +58,9 @@ def load_Igor(path):
     ----------
     path : str
         The file path to the Igor Pro file.
+    channels : list of int, optional
+        AI channels to load (e.g. [0, 2]); by default all recorded channels
+        are loaded.
 
     Returns
     -------
@@ -90,7 +95,7 @@ def load_Igor(path):
     # Load header
     scmf.loadSMH(path, verbose=False)
     # Load data
-    scmf.loadSMP()
+    scmf.loadSMP(channels=channels)
     return scmf
 
 def build_wParams(initialised_SMP_object):
@@ -131,8 +136,9 @@ def build_wParams(initialised_SMP_object):
         An Igor Wave containing numeric values for specified parameters.
     """
     # Build wParamsNum and wParamsStr
-    keys = initialised_SMP_object._kvPairDict.keys() 
-    AllParams = [(i, initialised_SMP_object._kvPairDict[i]) for i in initialised_SMP_object._kvPairDict]
+    kvPairDict = initialised_SMP_object._kvPairDict
+    keys = kvPairDict.keys() 
+    AllParams = [(i, kvPairDict[i]) for i in kvPairDict]
     AllParams_arr = np.array(AllParams, dtype = object)
     # Get all info for wParamsStr and compile two lits (list lables and list values)
     guid = initialised_SMP_object.GUID # no clue what this is but is included in wParamsStr
@@ -140,7 +146,7 @@ def build_wParams(initialised_SMP_object):
     "TimeStamp", "ScanMproductVersionAndTargetOS", "CallingProcessPath", "CallingProcessVersion",
     "StimBufLenList", "TargetedStimDurList", "TargetedStimDurList", "InChan_PixBufLenList", 
     "ScanPathFunc", "IgorGUIVer", "Comment", "Objective", "RealStimDurList"]
-    wParamsStr_vals = [str(f'"{initialised_SMP_object._kvPairDict[i][2]}"') for i in wParamsStr_labels]
+    wParamsStr_vals = [str(f'"{kvPairDict[i][2]}"') for i in wParamsStr_labels]
     # Go through and clean up all indeces so they match current IGOR implementation (not so many so just setting this manually)
     wParamsStr_vals[0]  = wParamsStr_vals[0].upper()
     wParamsStr_vals[1]  = wParamsStr_vals[1].upper()
@@ -154,10 +160,11 @@ def build_wParams(initialised_SMP_object):
     wParamsStr_vals = np.array(wParamsStr_vals, dtype = object)
     # Do similar for wParamsStr (all this info comes from ScM_FileIO.ipf in Igor installation)
     wParamsNum_labels = list(ParamsNum_IGORtoPython_dict.values())
-    wParamsNumlabels_IGOR = pull_labels_and_clean(r".\NumParams_label_list.txt")
+    wParamsNumlabels_IGOR = pull_labels_and_clean(
+        pathlib.Path(__file__).parent.joinpath("NumParams_label_list.txt"))
     wParamsNumlabels_labels_Python = [ParamsNum_IGORtoPython_dict[i] for i in wParamsNumlabels_IGOR]
     wParamsNum_vals = np.zeros([60])
-    wParamsNum_val_lable_tuples = [(i, initialised_SMP_object._kvPairDict[i][2]) if i in initialised_SMP_object._kvPairDict else (i, 0) for i in wParamsNumlabels_labels_Python]
+    wParamsNum_val_lable_tuples = [(i, kvPairDict[i][2]) if i in kvPairDict else (i, 0) for i in wParamsNumlabels_labels_Python]
     for n, i in enumerate(wParamsNum_val_lable_tuples):
         wParamsNum_vals[n] = i[1]
     # # Now that needs to go to into .ibw files
@@ -168,6 +175,49 @@ def build_wParams(initialised_SMP_object):
     return wParamsStr, wParamsNum
     # return wParamsStr_vals, wParamsNum_vals
 
+def build_wTriggers(scanm_file_object, threshold=20000, min_gap_s=0.1, chunk=100):
+    """
+    Build the trigger event table of Channel 2 as Igor Wave.
+
+    Parameters
+    ----------
+    scanm_file_object : SMP
+        A ScanM File object with a loaded header (`loadSMH`); the pixel data
+        does not need to be loaded.
+
+    threshold : int, optional
+        Level at or above which Channel 2 signals a trigger (default 20000,
+        as `Trigger_Threshold` in the Igor OS_Parameters).
+
+    min_gap_s : float, optional
+        Triggers less than this after the previous one are ignored (default
+        0.1 s, as `Trigger_after_skip_s` in the Igor OS_Parameters).
+
+    chunk : int, optional
+        Number of frames read at a time (default 100).
+
+    Returns
+    -------
+    wTriggers : IgorWave
+        A 4 x n wave with one column per trigger; the rows `Frame`, `Line`
+        and `Pixel` (in the uncropped frame) locate the pixel at which the
+        trigger starts, `Time_s` is its time from the start of the recording.
+
+    Notes
+    -----
+    Channel 2 is thresholded block by block (`SMP.getTriggerEvents`), so the
+    trigger timing has pixel resolution without keeping any of the channel's
+    pixel data.
+    """
+    events = scanm_file_object.getTriggerEvents(
+        ch=2, threshold=threshold, minGap_s=min_gap_s, chunk=chunk)
+    if events is None:
+        raise ValueError("Cannot read trigger channel")
+    table = np.array([events[n] for n in events.dtype.names], dtype = np.float64)
+    wTriggers = igorwriter.IgorWave(table, name = "wTriggers")
+    wTriggers.set_dimensionlablels(["Frame", "Line", "Pixel", "Time_s"])
+    return wTriggers
+
 def output_ch2crop(scanm_file_object, input_path):
     """
     Process and save cropped Channel 2 data along with relevant Igor Waves.
@@ -231,31 +281,279 @@ def output_ch2crop(scanm_file_object, input_path):
             i.save(save_path.joinpath(current_name).with_suffix(".ibw"))
     print("Done. Saved outputs to", save_path)
 
-def filesize_reducer(input_path):
+def output_ch2crop_streamed(scanm_file_object, input_path, chunk=100, triggers=False):
     """
-    Reduce the file size of an Igor Pro file by cropping Channel 2 data.
+    Stream cropped Channel 0 and trimmed Channel 2 data into Igor Waves.
 
     Parameters
     ----------
+    scanm_file_object : SMP
+        A ScanM File object with a loaded header (`loadSMH`); the pixel data
+        does not need to be loaded.
+
     input_path : str
-        The file path to the input Igor Pro file.
+        The file path to the input ScanM file.
+
+    chunk : int, optional
+        Number of frames read, cropped and written at a time (default 100).
+
+    triggers : bool, optional
+        If True, Channel 2 is saved as trigger event table (`wTriggers.ibw`,
+        see `build_wTriggers`) instead of the two pixel columns in
+        `wDataCh2.ibw` (default False).
+
+    Notes
+    -----
+    Produces the same outputs as `output_ch2crop`, but reads the imaging data
+    block by block with `SMP.iter_frames` and appends each block to the .ibw
+    files right away (`IgorWave.open_writer`; the wave shape is known from
+    `SMH.probe`). Peak memory is therefore set by `chunk` and the frame size,
+    not by the length of the recording.
+
+    Examples
+    --------
+    >>> scanm_file = SMP()
+    >>> scanm_file.loadSMH("path/to/scanm_file.smh")
+    >>> output_ch2crop_streamed(scanm_file, "path/to/scanm_file.smp")
+    >>> # Check the output folder for saved Igor Waves and tables.
+    """
+    # Create nice paths for save directory
+    input_path = pathlib.Path(input_path)
+    save_path = input_path.parent.joinpath(input_path.stem)
+    # Create storage folder
+    save_path.mkdir(exist_ok = True)
+    # Stream imaging data into .ibw files (frames become the last dimension,
+    # as in `output_ch2crop`); channel 2 is trimmed to the trigger columns
+    errC, info = scanm_file_object.probe()
+    if errC != 0:
+        raise ValueError(f"Cannot read pixel data of {input_path}")
+    n_frames, n_lines, n_pixels = info["croppedShape"]
+    stacks = [(0, "wDataCh0", None)] if triggers else [(0, "wDataCh0", None), (2, "wDataCh2", 2)]
+    for ch, name, n_columns in stacks:
+        print("Writing", name)
+        shape = (len(range(n_pixels)[:n_columns]), n_lines, n_frames)
+        wave = igorwriter.IgorWave([], name = name)
+        with wave.open_writer(save_path.joinpath(name).with_suffix(".ibw"), shape, info["dtype"]) as writer:
+            for _, block in scanm_file_object.iter_frames(ch=ch, chunk=chunk, crop=True):
+                writer.append(block[:, :, :n_columns].swapaxes(0, 2))
+    if triggers:
+        print("Writing wTriggers")
+        build_wTriggers(scanm_file_object, chunk=chunk).save(save_path.joinpath("wTriggers.ibw"))
+    # Parameter tables (after reading the pixel data, which corrects some of the
+    # header parameters, as `loadSMP` does)
+    wParamsStr, wParamsNum = build_wParams(scanm_file_object)
+    for i in [wParamsStr, wParamsNum]:
+        print("Writing", i.name)
+        i.save_itx(save_path.joinpath(i.name).with_suffix(".itx"))
+    print("Done. Saved outputs to", save_path)
+
+def output_ch2crop_pxp(scanm_file_object, input_path, chunk=100, triggers=False):
+    """
+    Stream cropped Channel 0 and trimmed Channel 2 data into an Igor packed experiment.
+
+    Parameters
+    ----------
+    scanm_file_object : SMP
+        A ScanM File object with a loaded header (`loadSMH`); the pixel data
+        does not need to be loaded.
+
+    input_path : str
+        The file path to the input ScanM file.
+
+    chunk : int, optional
+        Number of frames read, cropped and written at a time (default 100).
+
+    triggers : bool, optional
+        If True, Channel 2 is saved as trigger event table (`wTriggers`, see
+        `build_wTriggers`) instead of the two pixel columns in `wDataCh2`
+        (default False).
 
     Notes
     -----
-    This function loads the Igor Pro file from the specified path, processes it by
-    cropping Channel 2 data, and saves the relevant information, effectively reducing
-    the file size.
+    Holds the same waves as the four files of `output_ch2crop_streamed`
+    (wDataCh0, wDataCh2, wParamsStr, wParamsNum), but in a single packed
+    experiment file (.pxp) next to the input file, in a data folder named
+    after the recording. The imaging data is streamed block by block into the
+    file, as in `output_ch2crop_streamed`.
+
+    Examples
+    --------
+    >>> scanm_file = SMP()
+    >>> scanm_file.loadSMH("path/to/scanm_file.smh")
+    >>> output_ch2crop_pxp(scanm_file, "path/to/scanm_file.smp")
+    >>> # Open path/to/scanm_file.pxp in Igor.
+    """
+    input_path = pathlib.Path(input_path)
+    save_path = input_path.with_suffix(".pxp")
+    errC, info = scanm_file_object.probe()
+    if errC != 0:
+        raise ValueError(f"Cannot read pixel data of {input_path}")
+    n_frames, n_lines, n_pixels = info["croppedShape"]
+    with igorwriter.IgorPackedExperiment(save_path) as pxp:
+        pxp.start_folder(input_path.stem)
+        stacks = [(0, "wDataCh0", None)] if triggers else [(0, "wDataCh0", None), (2, "wDataCh2", 2)]
+        for ch, name, n_columns in stacks:
+            print("Writing", name)
+            shape = (len(range(n_pixels)[:n_columns]), n_lines, n_frames)
+            wave = igorwriter.IgorWave([], name = name)
+            with pxp.open_wave_writer(wave, shape, info["dtype"]) as writer:
+                for _, block in scanm_file_object.iter_frames(ch=ch, chunk=chunk, crop=True):
+                    writer.append(block[:, :, :n_columns].swapaxes(0, 2))
+        if triggers:
+            print("Writing wTriggers")
+            pxp.save_wave(build_wTriggers(scanm_file_object, chunk=chunk))
+        wParamsStr, wParamsNum = build_wParams(scanm_file_object)
+        # The string values are quoted for .itx files, binary text waves hold them as is
+        wParamsStr.array = np.array([v[1:-1] for v in wParamsStr.array], dtype = object)
+        for i in [wParamsStr, wParamsNum]:
+            print("Writing", i.name)
+            pxp.save_wave(i)
+    print("Done. Saved outputs to", save_path)
+
+def filesize_reducer(input_path, chunk=100):
+    """
+    Reduce the file size of an Igor Pro file by cropping Channel 2 data.
 
     Parameters
     ----------
     input_path : str
         The file path to the input Igor Pro file.
 
+    chunk : int, optional
+        Number of frames processed at a time (default 100).
+
+    Notes
+    -----
+    This function loads the header of the Igor Pro file from the specified path,
+    then streams the imaging data through cropping of Channel 2 data into the
+    output files, effectively reducing the file size. Memory use is bounded by
+    `chunk`, so recordings larger than the available RAM can be reduced.
+
     Examples
     --------
     >>> input_file_path = "path/to/igor_file.ibw"
     >>> filesize_reducer(input_file_path)
     >>> # Check the output folder for reduced file size Igor Waves and tables.
     """
-    scanmfile = load_Igor(input_path)
-    output_ch2crop(scanmfile, input_path)
\ No newline at end of file
+    scanmfile = SMP()
+    scanmfile.loadSMH(input_path, verbose=False)
+    output_ch2crop_streamed(scanmfile, input_path, chunk=chunk)
+
+def estimate_peak_memory(input_path, chunk=100, process_overhead=200 * 2**20):
+    """
+    Estimate the peak memory of `filesize_reducer` for a recording.
+
+    Parameters
+    ----------
+    input_path : str
+        The file path to the ScanM file (.smh or .smp).
+
+    chunk : int, optional
+        Number of frames processed at a time (default 100).
+
+    process_overhead : int, optional
+        Memory of a worker process before any data is read, in bytes
+        (Python, NumPy and the parsed header; default 200 MB).
+
+    Returns
+    -------
+    int
+        Estimated peak memory in bytes.
+
+    Notes
+    -----
+    Only the .smh header and the size of the .smp file are read (see
+    `SMH.probe`); a truncated .smp file raises a ValueError. Per block of
+    `chunk` frames, the streaming reducer holds the pixel buffers read from
+    the file, the cropped frames and their byte copy written to the .ibw
+    file, i.e. about three times the block size.
+    """
+    scmh = SMH()
+    if scmh.loadSMH(str(input_path), verbose=False) != 0:
+        raise FileNotFoundError(f"Cannot load header of {input_path}")
+    errC, info = scmh.probe()
+    if info is None:
+        raise ValueError(f"Cannot determine pixel data layout of {input_path}")
+    if not info["isComplete"]:
+        raise ValueError(
+            f"Pixel data of {input_path} truncated ({info['nFrInFile']} of {info['nFr']} frames)"
+        )
+    frame_bytes = info["bytesPerChannel"] // max(1, info["nFr"])
+    return int(process_overhead + 3 * chunk * frame_bytes)
+
+def batch_filesize_reducer(input_paths, memory_budget=8 * 2**30, max_workers=None, chunk=100):
+    """
+    Run `filesize_reducer` on many recordings in parallel processes.
+
+    Parameters
+    ----------
+    input_paths : str or list of str
+        A directory (all .smp files in it are processed), a glob pattern
+        (e.g. "/data/20240101/*/Raw/*.smp") or a list of file paths.
+
+    memory_budget : int, optional
+        Total memory the running reducers may use, in bytes (default 8 GB).
+
+    max_workers : int, optional
+        Maximum number of processes (default: number of CPUs).
+
+    chunk : int, optional
+        Number of frames processed at a time by each reducer (default 100).
+
+    Returns
+    -------
+    dict
+        Maps each file path to None on success or to the error message.
+
+    Notes
+    -----
+    The peak memory of each file is estimated from its .smh header (see
+    `estimate_peak_memory`). A file is only started when its estimate fits
+    into what is left of `memory_budget` by the running files; a file that
+    exceeds the budget on its own is run alone. On Windows, call this from
+    within an `if __name__ == "__main__":` block.
+
+    Examples
+    --------
+    >>> results = batch_filesize_reducer("path/to/Raw", memory_budget=12 * 2**30)
+    >>> failed = {p: e for p, e in results.items() if e is not None}
+    """
+    if isinstance(input_paths, (str, pathlib.Path)):
+        input_paths = str(input_paths)
+        if os.path.isdir(input_paths):
+            input_paths = os.path.join(input_paths, "*.smp")
+        input_paths = sorted(glob.glob(input_paths, recursive=True))
+    input_paths = [str(p) for p in input_paths]
+    max_workers = max_workers or os.cpu_count() or 1
+
+    results = {}
+    pending = []
+    for path in input_paths:
+        try:
+            pending.append((path, estimate_peak_memory(path, chunk=chunk)))
+        except Exception as e:
+            results[path] = f"{type(e).__name__}: {e}"
+
+    running = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            # Start files as long as they fit into the memory budget
+            used = sum(need for _, need in running.values())
+            while pending and len(running) < max_workers:
+                path, need = pending[0]
+                if running and used + need > memory_budget:
+                    break
+                pending.pop(0)
+                print(f"Starting {path} (~{need / 2**20:.0f} MB)")
+                running[pool.submit(filesize_reducer, path, chunk)] = (path, need)
+                used += need
+
+            # Wait for at least one file to finish
+            done, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                path, _ = running.pop(future)
+                error = future.exception()
+                results[path] = None if error is None else f"{type(error).__name__}: {error}"
+                print("Finished" if error is None else "Failed", path)
+    return results
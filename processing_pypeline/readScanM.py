@@ -6,8 +6,6 @@ Created on Wed May 18 14:45:10 2016
 """
 
 import numpy as np
-import struct
-import sys
 #def get_key(key=None,dictionary=None):
 #    """small function to get values from keys in the dictionary of the header.
 #    necessary since the header output has a funny format. To be removed in 
@@ -16,10 +14,17 @@ import sys
     
     
 def read_in_data(filePath=None, header = None, 
-                 readChan1=False,readChan2=False,readChan3=False,readChan4=False):
+                 readChan1=False,readChan2=False,readChan3=False,readChan4=False,
+                 mmap=False):
     """function to read the binary data (the actual data coming from the
     Analog Inputs of the NI cards), as recorded by scanM. It requires the
-    dictionary provided by "read_in_header" function to properly process data"""
+    dictionary provided by "read_in_header" function to properly process data.
+
+    The data keeps its recorded dtype (uint16, or float64 for 8-byte pixels).
+    With mmap=True the file is memory-mapped instead of read, so that only the
+    requested channels are loaded into memory (for files larger than memory).\n
+    returns a dictionary with the serialized data of each requested channel
+    ("chan1" for the first recorded channel etc.)"""
     
     # grab some variables from header dictionary:
     frameWidth = int(header["FrameWidth"])
@@ -38,113 +43,32 @@ def read_in_data(filePath=None, header = None,
     #channels)
     pixBuffer = int(header["PixelBuffer_#0_Length"])
     
-   
+    dtype = np.float64 if int(header.get("PixelSizeInBytes", 2)) == 8 else np.uint16
 
     ##########___________READ IN PIXELS___________________
 
-    
-    #open binary - right now the whole file is read, which could lead to problems for large files
-
-#    
-    #read data in x steps
-    steps=4
-    #open binary data 
-    with open(filePath,"rb") as fid:
-        #move to end of file and get the total number of bytes
-        numBytes = fid.seek(0,2)
-        #move back to beg of file
-        fid.seek(0,0)
-        #the data is composed of 16bit integers, 
-        #meaning each number is represented with 2 bytes
-        values=np.array([],dtype="int16")
-        for i in range(steps):
-            #print (fid.tell())
-            #read the first fifth of the file
-            length2read=int(numBytes/steps)
-            temp = fid.read(length2read)
-        
-            numList = ["h"]*int(length2read/2) # each number is represented by two bytes
-            numList = "".join(numList)
-        
-            values = np.concatenate((values,struct.unpack_from(numList,temp,offset=0)))
-            
-        
+    if mmap:
+        values = np.memmap(filePath, dtype=dtype, mode="r")
+    else:
+        values = np.fromfile(filePath, dtype=dtype)
 
-        
+    #number of channels recorded is given by the input channel mask (older
+    #headers: the data length divided by frameWidthXframeHeightXnFrames)
+    if "InputChannelMask" in header:
+        nChannels = bin(int(header["InputChannelMask"])).count("1")
+    else:
+        nChannels = int(len(values)/(nFrames*frameWidth*frameHeight))
+
+    #the pixel buffers hold pixBuffer values of each channel, one channel after
+    #the other; the file ends with a copy of the pre-header, which is skipped
+    nPixBuffers = len(values)//(nChannels*pixBuffer)
+    channels = values[:nPixBuffers*nChannels*pixBuffer].reshape(
+        nPixBuffers, nChannels, pixBuffer).transpose(1, 0, 2)
 
-    #number of channels recorded is given by the data lenght divided by result 
-    # of frameWidthXframeHeightXnFrames 
-    #- couldn't find this information in the header
-    nChannels = int(len(values)/(nFrames*frameWidth*frameHeight))
-    
-    
-    #empty arrays to store data
-    ###to do: preallocate array the size of each should be (nFrames*frameWidth*frameHeight)
-    if readChan1 is True:
-        data1=np.zeros(shape = ((nFrames+1)*frameWidth*frameHeight),dtype=int)
-#        data1=np.array([],dtype="int32")
-    if readChan2 is True:
-        data2=np.zeros(shape = ((nFrames+1)*frameWidth*frameHeight),dtype=int)
-#        data2=np.array([],dtype="int32")
-    if readChan3 is True:
-        data3=np.zeros(shape = ((nFrames+1)*frameWidth*frameHeight),dtype=int)
-#        data3=np.array([],dtype="int32")
-    if readChan4 is True:
-        data4=np.zeros(shape = ((nFrames+1)*frameWidth*frameHeight),dtype=int)
-        
-    beg1=0
-    beg2=0
-    beg3=0
-    beg4=0
-    for i in range(0,len(values),nChannels*pixBuffer):
-        if readChan1 is True:
-            end1 = i+int(pixBuffer)
-            data1[beg1:beg1+len(values[i:end1])]=values[i:end1]
-            beg1=beg1+len(values[i:end1])
-        
-        if readChan2 is True and nChannels>=2:
-            end2 = i+int(2*pixBuffer)
-            chanInd2 = i+pixBuffer
-            data2[beg2:beg2+len(values[chanInd2:end2])]=values[chanInd2:end2]
-            beg2=beg2+len(values[chanInd2:end2])
-        
-        if readChan3 is True and nChannels>=3:
-            end3 = i+int(3*pixBuffer)
-            chanInd3 = i+2*pixBuffer
-            data3[beg3:beg3+len(values[chanInd3:end3])]=values[chanInd3:end3]
-            beg3=beg3+len(values[chanInd3:end3])
-        if readChan4 is True and nChannels>=4:
-            end4 = i+int(4*pixBuffer)
-            chanInd4 = i+3*pixBuffer
-            data4[beg4:beg4+len(values[chanInd4:end4])]=values[chanInd4:end4]
-            beg4=beg4+len(values[chanInd4:end4])
-                
-    #run through data array to sort into the different channels
-    #x=0
-    
-#    for i in range(0,len(values),nChannels*int(pixBuffer)):
-#        if readChan1 is True:
-#            channel1Indx = i 
-#            data1 = np.concatenate((data1,values[channel1Indx:channel1Indx+int(pixBuffer)]))
-#            
-#        if nChannels > 1 and readChan2 is True:
-#            channel2Indx = i+pixBuffer
-#            data2 = np.concatenate((data2,values[channel2Indx:channel2Indx+int(pixBuffer)]))
-#            
-#        if nChannels > 2 and readChan3 is True:
-#            channel3Indx = i+(2*pixBuffer)
-#            data3 = np.concatenate((data3,values[channel3Indx:channel3Indx+int(pixBuffer)]))
-#    
-    
     output = dict()
-    if readChan1 is True:
-        output["chan1"] = data1
-    if readChan2 is True and nChannels>=2:
-        output["chan2"] = data2
-    if readChan3 is True and nChannels>=3:
-        output["chan3"] = data3
-    if readChan4 is True and nChannels>=4:
-        output["chan4"] = data4
+    for iChan, readChan in enumerate([readChan1, readChan2, readChan3, readChan4]):
+        if readChan is True and nChannels > iChan:
+            output["chan%d" % (iChan + 1)] = np.ascontiguousarray(channels[iChan]).reshape(-1)
     return output
 
 
@@ -210,26 +134,66 @@ def to_frame(dataArray=[],frameTotal=2,frameCounter=1,frameBuffer=1,frameHeight=
     return c1
 
 
-def trigger_detection(frameData,triggerLevel=220,triggerMode=1):
+def trigger_edges(frameBlocks,triggerLevel=220,releaseLevel=None,minGap=0):
+    """detect the rising edges of a trigger channel at line resolution.
+
+    frameBlocks is a (frames, lines, pixels) stack or an iterable of such blocks
+    of consecutive frames (or of single frames), e.g.
+    (block for _, block in smp.iter_frames(ch=2)), so that the whole stack does
+    not need to be in memory.\n
+    triggerLevel: a line goes high when one of its pixels reaches this level.\n
+    releaseLevel: ... and low again only when all of its pixels are below this
+    level (hysteresis; default triggerLevel).\n
+    minGap: rising edges less than minGap lines after the previous one are
+    dropped.\n
+    returns the frame and line indexes of the rising edges and the number of
+    frames"""
+    if releaseLevel is None:
+        releaseLevel = triggerLevel
+    if isinstance(frameBlocks, np.ndarray) and frameBlocks.ndim == 3:
+        frameBlocks = [frameBlocks]
+
+    edges = list()
+    lastEdge = None
+    state = 0
+    nLinesTotal = 0
+    nLines = 1
+    for block in frameBlocks:
+        block = np.asarray(block)
+        if block.ndim == 2:
+            block = block[np.newaxis]
+        nLines = block.shape[1]
+        lineMax = block.reshape(-1, block.shape[2]).max(axis=1)
+        #per line: 1 sets, 0 resets and -1 keeps the state of the previous line;
+        #the state is carried over from the previous block
+        setReset = np.where(lineMax >= triggerLevel, 1, np.where(lineMax < releaseLevel, 0, -1))
+        setReset = np.concatenate(([state], setReset))
+        iLast = np.maximum.accumulate(np.where(setReset >= 0, np.arange(len(setReset)), 0))
+        high = setReset[iLast]
+        state = high[-1]
+        for edge in (np.flatnonzero(np.diff(high) > 0) + nLinesTotal).tolist():
+            if lastEdge is None or edge - lastEdge >= minGap:
+                edges.append(edge)
+                lastEdge = edge
+        nLinesTotal += len(lineMax)
+
+    edges = np.array(edges, dtype=int)
+    return edges // nLines, edges % nLines, nLinesTotal // nLines
+
+
+def trigger_detection(frameData,triggerLevel=220,triggerMode=1,releaseLevel=None,minGap=0):
     """detect triggers from one of the recorded channels.
-    in our setup normally channel3 contains trigger data"""
-    #create zeros array. later "ones" will be placed to indicate trigger point.
-    #the array length is equal to the number of frames on the channel used.
-    
-    trigArray = np.zeros(shape=(len(frameData)),dtype=int)
-    indexes=list()
-    for i,frame in enumerate(frameData):
-    
-        if np.any(frame>=triggerLevel):
-            indexes.append(i)
-    
-    ########TODO#########
-    ### figure out if killing triggers that happen next to one another is desirable
-    #####################
-    
+    in our setup normally channel3 contains trigger data.
+
+    frameData is the stack of the channel, or an iterable of blocks of frames
+    (see trigger_edges for this and for releaseLevel and minGap).\n
+    returns the frames in which triggers start (every triggerMode-th trigger)
+    and an array, one entry per frame, with ones at these frames"""
+    frames, _, nFrames = trigger_edges(frameData, triggerLevel=triggerLevel,
+                                       releaseLevel=releaseLevel, minGap=minGap)
     #drop triggers depending on trigger mode.
-
-    indexes=indexes[::triggerMode]
+    indexes = frames[::triggerMode].tolist()
     #populate triggerArray with ones
-    trigArray[indexes]=1
-    return indexes,trigArray
+    trigArray = np.zeros(shape=nFrames, dtype=int)
+    trigArray[indexes] = 1
+    return indexes, trigArray
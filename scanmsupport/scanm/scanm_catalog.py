@@ -0,0 +1,254 @@
+# ----------------------------------------------------------------------------
+# scanm_catalog.py
+# Catalog of ScanM recordings (`.smh` header files) in a SQLite database
+#
+# The MIT License (MIT)
+# (c) Copyright 2022-23 Thomas Euler, Jonathan Oesterle
+#
+# 2026-10-14, first implementation
+# ----------------------------------------------------------------------------
+import contextlib
+import glob
+import io
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from .scanm_global import *
+from .scanm_smh import SMH
+
+# Columns of the catalog table (name, SQLite type)
+SCMIO_catalogColumns = [
+    ("path", "TEXT PRIMARY KEY"),
+    ("name", "TEXT"),
+    ("smhSize_byte", "INTEGER"),
+    ("smhMTime_ns", "INTEGER"),
+    ("smpSize_byte", "INTEGER"),
+    ("smpMTime_ns", "INTEGER"),
+    ("GUID", "TEXT"),
+    ("userName", "TEXT"),
+    ("dateStamp", "TEXT"),
+    ("timeStamp", "TEXT"),
+    ("scanMode", "INTEGER"),
+    ("scanModeStr", "TEXT"),
+    ("scanType", "INTEGER"),
+    ("scanPathFunc", "TEXT"),
+    ("dxFr_pix", "INTEGER"),
+    ("dyFr_pix", "INTEGER"),
+    ("dzFr_pix", "INTEGER"),
+    ("dxOffs_pix", "INTEGER"),
+    ("dxRetrace_pix", "INTEGER"),
+    ("nFr", "INTEGER"),
+    ("isComplete", "INTEGER"),
+    ("zoom", "REAL"),
+    ("pixDur_us", "REAL"),
+    ("inputChMask", "INTEGER"),
+    ("nInputCh", "INTEGER"),
+    ("stimChMask", "INTEGER"),
+    ("xCoord_um", "REAL"),
+    ("yCoord_um", "REAL"),
+    ("zCoord_um", "REAL"),
+    ("error", "TEXT")
+]
+SCMIO_catalogTableStr = "recordings"
+
+
+# ----------------------------------------------------------------------------
+def _getFileState(fPathSMH):
+    """ Returns size and modification time of the header and pixel data file
+        (None for a missing pixel data file)
+    """
+    st = os.stat(fPathSMH)
+    fPathSMP = os.path.splitext(fPathSMH)[0] + "." + SCMIO_pixelDataFileExtStr
+    try:
+        stp = os.stat(fPathSMP)
+        return st.st_size, st.st_mtime_ns, stp.st_size, stp.st_mtime_ns
+    except FileNotFoundError:
+        return st.st_size, st.st_mtime_ns, None, None
+
+
+def _toSQL(v):
+    # Convert numpy scalars and lists into values SQLite can store
+    if v is None or isinstance(v, str):
+        return v
+    if isinstance(v, (list, tuple)):
+        return "|".join(str(x) for x in v)
+    try:
+        return v.item()
+    except AttributeError:
+        return v
+
+
+def scm_read_catalog_entry(fPathSMH):
+    """ Parse header file `fPathSMH` (complete path w/ extension) and return
+        the catalog entry as dict; a header that cannot be parsed is returned
+        w/ the error message in `error`, as is a recording whose pixel data
+        layout cannot be determined (w/ the header columns filled in)
+    """
+    row = dict.fromkeys(c[0] for c in SCMIO_catalogColumns)
+    row["path"] = fPathSMH
+    row["name"] = os.path.splitext(os.path.basename(fPathSMH))[0]
+    (row["smhSize_byte"], row["smhMTime_ns"],
+     row["smpSize_byte"], row["smpMTime_ns"]) = _getFileState(fPathSMH)
+
+    smh = SMH()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            errC = smh.loadSMH(fPathSMH)
+            if errC != ERR_Ok:
+                row["error"] = ERRStr[errC]
+                return row
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+        return row
+
+    scanMode = smh.scanMode
+    row.update({
+        "GUID": smh.GUID,
+        "userName": smh.get(SCMIO_keys.UserName),
+        "dateStamp": smh.get(SCMIO_keys.DateStamp_d_m_y),
+        "timeStamp": smh.get(SCMIO_keys.TimeStamp_h_m_s_ms),
+        "scanMode": scanMode,
+        "scanModeStr": ScM_scanModeStr[scanMode] if scanMode in range(len(ScM_scanModeStr)) else None,
+        "scanType": smh.scanType,
+        "scanPathFunc": smh.get(SCMIO_keys.USER_scanPathFunc),
+        "dxFr_pix": smh.dxFr_pix,
+        "dyFr_pix": smh.dyFr_pix,
+        "dzFr_pix": smh.dzFr_pix,
+        "dxOffs_pix": smh.dxOffs_pix,
+        "dxRetrace_pix": smh.dxRetrace_pix,
+        "zoom": smh.zoom,
+        "pixDur_us": smh.pixDur_us,
+        "inputChMask": smh.inputChMask,
+        "nInputCh": smh.nInputCh,
+        "stimChMask": smh.stimChMask,
+        "xCoord_um": smh.get(SCMIO_keys.USER_coordX),
+        "yCoord_um": smh.get(SCMIO_keys.USER_coordY),
+        "zCoord_um": smh.get(SCMIO_keys.USER_coordZ)
+    })
+
+    # Only the number of frames depends on the pixel data layout
+    if row["smpSize_byte"] is not None:
+        log = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(log):
+                errC, info = smh.probe()
+        except Exception as e:
+            row["error"] = f"{type(e).__name__}: {e}"
+        else:
+            if info is not None:
+                row["nFr"] = info["nFr"]
+                row["isComplete"] = info["isComplete"]
+            else:
+                msg = log.getvalue().strip().splitlines()
+                row["error"] = msg[-1] if msg else ERRStr[errC]
+    return {k: _toSQL(v) for k, v in row.items()}
+
+
+# ----------------------------------------------------------------------------
+class SMHCatalog(object):
+    """ Catalog of the ScanM recordings in one or more directory trees, stored in
+        the SQLite database `dbPath`. One row per `.smh` header file holds the
+        scan mode, frame geometry, zoom, channel masks, GUID, file sizes, stage
+        coordinates and scan path function (see `SCMIO_catalogColumns`).
+        `update` only parses new or changed header files, i.e. headers whose size
+        or modification time (or that of their pixel data file) has changed.
+    """
+
+    def __init__(self, dbPath):
+        self._dbPath = str(dbPath)
+        self._db = sqlite3.connect(self._dbPath)
+        self._db.row_factory = sqlite3.Row
+        cols = ", ".join(f"{n} {t}" for n, t in SCMIO_catalogColumns)
+        with self._db:
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS {SCMIO_catalogTableStr} ({cols})")
+            for col in ["name", "zoom", "nInputCh", "dateStamp", "GUID"]:
+                self._db.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{col} ON {SCMIO_catalogTableStr} ({col})"
+                )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    def __len__(self):
+        return self._db.execute(f"SELECT COUNT(*) FROM {SCMIO_catalogTableStr}").fetchone()[0]
+
+    def update(self, rootDir, workers=None, verbose=False):
+        """ Index all `.smh` files below `rootDir`; new or changed files are parsed
+            by `workers` processes (default: number of CPUs, 1 parses in this
+            process), entries of files that no longer exist are removed.
+            Returns the number of parsed, unchanged and removed files
+        """
+        rootDir = os.path.abspath(str(rootDir))
+        pattern = os.path.join(glob.escape(rootDir), "**", "*." + SCMIO_headerFileExtStr)
+        fPaths = sorted(glob.glob(pattern, recursive=True))
+
+        # Find new and changed files
+        known = {
+            r["path"]: (r["smhSize_byte"], r["smhMTime_ns"], r["smpSize_byte"], r["smpMTime_ns"])
+            for r in self._db.execute(
+                f"SELECT path, smhSize_byte, smhMTime_ns, smpSize_byte, smpMTime_ns"
+                f" FROM {SCMIO_catalogTableStr} WHERE path LIKE ? ESCAPE '\\'",
+                (self._escapeLike(os.path.join(rootDir, "")) + "%",)
+            )
+        }
+        toParse = []
+        for fPath in fPaths:
+            try:
+                if known.pop(fPath, None) != _getFileState(fPath):
+                    toParse.append(fPath)
+            except FileNotFoundError:
+                # Removed since globbing
+                pass
+        nUnchanged = len(fPaths) - len(toParse)
+        if verbose:
+            scm_log(f"{len(fPaths)} header(s) found, {len(toParse)} new or changed")
+
+        # Parse headers
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(toParse) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                rows = list(pool.map(
+                    scm_read_catalog_entry, toParse,
+                    chunksize=max(1, len(toParse) // (4 * workers))
+                ))
+        else:
+            rows = [scm_read_catalog_entry(fPath) for fPath in toParse]
+
+        # Store entries and remove those of deleted files
+        cols = [c[0] for c in SCMIO_catalogColumns]
+        with self._db:
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO {SCMIO_catalogTableStr} ({', '.join(cols)})"
+                f" VALUES ({', '.join('?' * len(cols))})",
+                [[r[c] for c in cols] for r in rows]
+            )
+            self._db.executemany(
+                f"DELETE FROM {SCMIO_catalogTableStr} WHERE path = ?", [(p,) for p in known]
+            )
+        if verbose:
+            nErr = sum(r["error"] is not None for r in rows)
+            scm_log(f"{len(rows)} header(s) parsed ({nErr} with errors), {len(known)} removed")
+        return len(rows), nUnchanged, len(known)
+
+    def query(self, where="1", params=()):
+        """ Returns the entries that match the SQL condition `where` as list of
+            dicts, e.g. `query("name LIKE ? AND nInputCh = ?", ("%chirp%", 3))`
+        """
+        return [
+            dict(r) for r in self._db.execute(
+                f"SELECT * FROM {SCMIO_catalogTableStr} WHERE {where} ORDER BY path", params
+            )
+        ]
+
+    @staticmethod
+    def _escapeLike(s):
+        return s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+# ----------------------------------------------------------------------------
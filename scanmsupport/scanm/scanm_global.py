@@ -11,6 +11,8 @@
 import struct
 from enum import Enum
 
+import numpy as np
+
 # pylint: disable=bad-whitespace
 SCMIO_VERBOSE = 0
 
@@ -62,6 +64,18 @@ ScM_simpleScanFuncList = ["XYScan2", "XYScan3", "XYZScan1"]
 
 SCMIO_preHeaderSize_bytes = 64
 
+# Number of bytes read from the pixel data file at once
+# (is rounded down to a multiple of the pixel buffer size)
+SCMIO_readBlockSize_bytes = 2 ** 26
+# ... and when reading ahead in a background thread
+SCMIO_readAheadBlockSize_bytes = 2 ** 23
+
+# Trigger events detected in an AI channel (pixel in the uncropped frame,
+# time from the start of the recording)
+SCMIO_triggerEventDType = np.dtype([
+    ("frame", np.int64), ("line", np.int64), ("pixel", np.int64), ("time_s", np.float64)
+])
+
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - 
 # Other definitions
 ScM_TTLlow = 0
@@ -96,6 +110,9 @@ ERR_SMH_NoParametersFound = 4
 ERR_CannotReshapePixelData = 5
 ERR_UnknownScanMode = 6
 Err_SMH_NoParametersFound = 7
+ERR_ChannelNotRecorded = 8
+ERR_InvalidFrameRange = 9
+ERR_PixelDataTruncated = 10
 
 ERRStr = [
     "Ok",
@@ -104,7 +121,11 @@ ERRStr = [
     "Invalid .smh object",
     ".smh parameter not found",
     "Cannot reshape pixel data",
-    "Unknown scan mode"
+    "Unknown scan mode",
+    ".smh parameter not found",
+    "AI channel `{0}` not recorded",
+    "Invalid frame range `{0}`",
+    "Pixel data file `{0}` truncated"
 ]
 
 
@@ -291,6 +312,103 @@ def scm_load_pre_header(fPath, offset=0):
     return d
 
 
+def scm_pack_pre_header(d, fileType):
+    """ Returns the 64-byte pre-header for the dict `d` (see `scm_load_pre_header`)
+        w/ the file type `fileType` (e.g. "SMH" or "SMP" for the post-header of
+        the pixel data file)
+    """
+    return struct.pack(
+        "4H16s5Q", *[ord(c) for c in fileType], 0, bytes.fromhex(d["GUID"]),
+        d["headerLen_byte"], d["headerLen_values"], d["headerStart_bytes"],
+        d["pixDataLen_byte"], d["analogDataLen_byte"]
+    )
+
+
+def scm_read_header_lines(fPath):
+    """ Read the key-value pair lines of the header file `fPath` (complete path
+        w/ extension) after the pre-header; the text is stored as UTF-16 (little
+        endian) and decoded in a single pass. Empty lines and the zero-padding
+        at the end of the file are skipped
+    """
+    with open(fPath, "rb") as f:
+        f.seek(SCMIO_preHeaderSize_bytes)
+        buf = f.read()
+    txt = buf[:len(buf) // 2 * 2].decode("utf-16-le")
+    txt = txt.replace("\r\n", "\n").replace("\r", "\n")
+    return [s for s in txt.split("\n") if len(s) > 0 and s[0] != "\x00"]
+
+
+def scm_write_header(fPath, preHdrDict, lines):
+    """ Write the header file `fPath` (complete path w/ extension) from the
+        pre-header dict `preHdrDict` and the key-value pair lines `lines`, as
+        UTF-16 (little endian); the header length entries (in the pre-header and
+        the `HdrLenInValuePairs` and `HdrLenInBytes` lines) are updated, a
+        KeyError is raised if one of these lines is missing. Returns the
+        updated pre-header dict
+    """
+    d = dict(preHdrDict)
+    lines = list(lines)
+    sKeys = [scm_get_entry_key(s) for s in lines]
+    for key in [SCMIO_keys.HdrLenInValuePairs, SCMIO_keys.HdrLenInBytes]:
+        if key.value not in sKeys:
+            raise KeyError(key.value)
+    iLnValues = sKeys.index(SCMIO_keys.HdrLenInValuePairs.value)
+    iLnBytes = sKeys.index(SCMIO_keys.HdrLenInBytes.value)
+    d["headerLen_values"] = len(lines)
+    d["headerStart_bytes"] = SCMIO_preHeaderSize_bytes
+    for _ in range(3):
+        # (the length may change w/ the number of digits of the entries)
+        buf = ("\r\n" + "".join(s + "\r\n" for s in lines) + "\x00").encode("utf-16-le")
+        n = SCMIO_preHeaderSize_bytes + len(buf)
+        if d.get("headerLen_byte") == n and scm_get_entry_value(lines[iLnValues]) == str(len(lines)):
+            break
+        d["headerLen_byte"] = n
+        lines[iLnValues] = scm_set_entry_value(lines[iLnValues], len(lines))
+        lines[iLnBytes] = scm_set_entry_value(lines[iLnBytes], n)
+    with open(fPath, "wb") as f:
+        f.write(scm_pack_pre_header(d, "SMH"))
+        f.write(buf)
+    return d
+
+
+def scm_get_entry_key(s):
+    """ Returns the key of the key-value pair line `s`
+    """
+    return s.split(SCMIO_typeKeySep, 1)[1].split(SCMIO_keyValueSep, 1)[0].strip()
+
+
+def scm_get_entry_value(s):
+    """ Returns the value string of the key-value pair line `s`
+    """
+    return s.split(SCMIO_keyValueSep, 1)[1].rstrip(SCMIO_entrySep).strip()
+
+
+def scm_set_entry_value(s, v):
+    """ Returns the key-value pair line `s` w/ the value `v`; fixed-width values
+        (padded w/ spaces) stay right-aligned to the width of the previous value
+    """
+    k, sv = s.split(SCMIO_keyValueSep, 1)
+    sv = sv.rstrip(SCMIO_entrySep)
+    pad = sv[:len(sv) - len(sv.lstrip())]
+    sv = str(v).rjust(len(sv)) if len(pad) > 1 else pad + str(v)
+    return k + SCMIO_keyValueSep + sv + SCMIO_entrySep
+
+
+def scm_readinto(f, buf):
+    """ Read from (unbuffered) file `f` into the writable buffer `buf` until it is
+        full or the end of the file is reached; returns the number of bytes read
+        (a single raw read may return less, e.g. on network file systems)
+    """
+    mv = memoryview(buf).cast("B")
+    n = 0
+    while n < len(mv):
+        nRead = f.readinto(mv[n:])
+        if not nRead:
+            break
+        n += nRead
+    return n
+
+
 def scm_log(msg, lf=True):
     """ Logs a message, currently simply by printing it to the history
     """
@@ -0,0 +1,154 @@
+# ----------------------------------------------------------------------------
+# scanm_hdf5.py
+# HDF5 export and import of ScanM recordings
+#
+# The MIT License (MIT)
+# (c) Copyright 2022-23 Thomas Euler, Jonathan Oesterle
+#
+# 2026-10-14, first implementation
+# ----------------------------------------------------------------------------
+import numpy as np
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+from .scanm_global import *
+
+# Layout as in the HDF5 files exported by Igor (e.g. `SMP_*.h5`): one dataset
+# per AI channel, named as the Igor wave, as (pixel, line, frame) array
+SCMIO_HDF5DataSetNameStr = "wDataCh{0}"
+SCMIO_HDF5ChunkSize_bytes = 2 ** 20
+
+
+# ----------------------------------------------------------------------------
+def _checkH5py():
+    if h5py is None:
+        raise ImportError("HDF5 support requires the `h5py` package")
+
+
+def _toAttr(v):
+    # Convert header values into values HDF5 attributes can store; lists that
+    # are not purely numeric (e.g. mixed or w/ None) are stored as strings
+    if isinstance(v, (list, tuple)):
+        if len(v) > 0 and all(isinstance(x, (int, float, np.number)) for x in v):
+            return np.array(v)
+        return np.array([str(x) for x in v], dtype=h5py.string_dtype())
+    return v
+
+
+def scm_save_hdf5(smp, fPath, channels=None, crop=True, compression=None,
+                  framesPerChunk=None, chunk=None):
+    """ Save the AI channels of the recording `smp` (`SMP` object w/ loaded
+        header, the pixel data does not need to be loaded) as HDF5 file `fPath`.
+        Each channel `ch` (default: all recorded channels) is stored in the
+        dataset `wDataCh<ch>` as (pixel, line, frame) array, cropped to the
+        imaging region if `crop` is True, chunked in blocks of `framesPerChunk`
+        frames (default: ~1 MB per chunk) and compressed w/ `compression`
+        (None, "gzip" or "lzf"). The header parameters and GUID are stored as
+        attributes of the file.
+        The pixel data is read once for all channels and streamed in blocks of
+        `chunk` frames (see `SMP.iter_frames`); `chunk` is rounded up to a
+        multiple of `framesPerChunk` (default: `framesPerChunk`), so that each
+        chunk of the datasets is written (and compressed) exactly once.
+        Returns error code
+    """
+    _checkH5py()
+    errC, info = smp.probe()
+    if errC != ERR_Ok:
+        scm_log("ERROR: " + ERRStr[errC])
+        return errC
+    channels = info["channels"] if channels is None else list(channels)
+    for ch in channels:
+        if ch not in info["channels"]:
+            scm_log("ERROR: " + ERRStr[ERR_ChannelNotRecorded].format(ch))
+            return ERR_ChannelNotRecorded
+    nFr, nY, nX = info["croppedShape"] if crop else info["shape"]
+    if framesPerChunk is None:
+        frameSize_bytes = nX * nY * np.dtype(info["dtype"]).itemsize
+        framesPerChunk = max(1, SCMIO_HDF5ChunkSize_bytes // frameSize_bytes)
+    framesPerChunk = max(1, min(framesPerChunk, nFr))
+    chunk = framesPerChunk if chunk is None else -(-max(1, chunk) // framesPerChunk) * framesPerChunk
+
+    with h5py.File(str(fPath), "w") as f:
+        f.attrs["GUID"] = smp.GUID
+        for k, (_, _, v) in smp._kvPairDict.items():
+            if v is not None:
+                try:
+                    f.attrs[k] = _toAttr(v)
+                except (TypeError, ValueError) as e:
+                    scm_log(f"WARNING: Header parameter `{k}` not stored ({e})")
+        dsList = []
+        for ch in channels:
+            ds = f.create_dataset(
+                SCMIO_HDF5DataSetNameStr.format(ch), shape=(nX, nY, nFr),
+                dtype=info["dtype"], chunks=(nX, nY, framesPerChunk),
+                compression=compression, shuffle=compression is not None
+            )
+            ds.attrs["channel"] = ch
+            ds.attrs["isCropped"] = crop
+            dsList.append(ds)
+        for iFr, block in smp.iter_frames(ch=channels, chunk=chunk, crop=crop):
+            for ds, w in zip(dsList, block):
+                ds[:, :, iFr:iFr + len(w)] = w.transpose(2, 1, 0)
+    return ERR_Ok
+
+
+# ----------------------------------------------------------------------------
+class SMPHDF5(object):
+    """ Read access to the AI channels of a recording in an HDF5 file, as written
+        by `scm_save_hdf5` or exported by Igor. The data is not read until sliced:
+        `getData(ch)[:, :, i0:i1]` reads only the chunks of frames `i0` to `i1`.
+    """
+
+    def __init__(self, fPath):
+        _checkH5py()
+        self._fPath = str(fPath)
+        self._f = h5py.File(self._fPath, "r")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._f.close()
+
+    @property
+    def filePath(self):
+        return self._fPath
+
+    @property
+    def channels(self):
+        """ Returns the AI channels in the file
+        """
+        prefix = SCMIO_HDF5DataSetNameStr.format("")
+        return sorted(
+            int(n[len(prefix):]) for n in self._f.keys()
+            if n.startswith(prefix) and n[len(prefix):].isdigit()
+        )
+
+    @property
+    def header(self):
+        """ Returns the header parameters as dict (empty for Igor exports)
+        """
+        return {k: v.decode("utf-8") if isinstance(v, bytes) else v
+                for k, v in self._f.attrs.items()}
+
+    @property
+    def GUID(self):
+        return self.header.get("GUID")
+
+    def getData(self, ch):
+        """ Returns the dataset of AI channel `ch` as (pixel, line, frame) array
+            (`h5py.Dataset`), or None if the channel is not in the file
+        """
+        name = SCMIO_HDF5DataSetNameStr.format(ch)
+        if name not in self._f:
+            scm_log("ERROR: " + ERRStr[ERR_ChannelNotRecorded].format(ch))
+            return None
+        return self._f[name]
+
+# ----------------------------------------------------------------------------
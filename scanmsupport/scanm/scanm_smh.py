@@ -15,6 +15,85 @@ import numpy as np
 from .scanm_global import *
 
 
+# ----------------------------------------------------------------------------
+class SMHRecord(object):
+    """ Frozen record of the parameters of a `.smh` header file; the values of
+        the well-known keys (see `SCMIO_keys`) are kept in slots named like the
+        `SCMIO_keys` member, those of other keys in an overflow dict. The order,
+        types and counts of the parameters (the layout) are shared between all
+        records with the same layout. Array values are kept as read-only views,
+        as records are shared (and cached)
+    """
+    __slots__ = tuple(k.name for k in SCMIO_keys) + ("_layout", "_extra")
+    _fieldDict = {k.value: k.name for k in SCMIO_keys}
+    _layoutDict = dict()
+
+    def __init__(self, kvPairDict):
+        """ Create record from a dict of `[type, count, value]` lists
+        """
+        setf = object.__setattr__
+        for name in self._fieldDict.values():
+            setf(self, name, None)
+        extra = dict()
+        layout = []
+        for sKey, (tid, n, v) in kvPairDict.items():
+            if isinstance(v, np.ndarray) and v.flags.writeable:
+                v = v.view()
+                v.flags.writeable = False
+            name = self._fieldDict.get(sKey)
+            if name is None:
+                extra[sKey] = v
+            else:
+                setf(self, name, v)
+            layout.append((sKey, tid, n))
+        layout = tuple(layout)
+        setf(self, "_layout", self._layoutDict.setdefault(layout, layout))
+        setf(self, "_extra", extra)
+
+    def __setattr__(self, name, v):
+        raise AttributeError("`SMHRecord` is read-only, use `replace`")
+
+    def __delattr__(self, name):
+        raise AttributeError("`SMHRecord` is read-only")
+
+    def __reduce__(self):
+        return self.__class__, (self.toKVPairs(),)
+
+    def __len__(self):
+        return len(self._layout)
+
+    def __contains__(self, sKey):
+        return any(k == sKey for k, _, _ in self._layout)
+
+    def get(self, sKey):
+        """ Returns the value for key string `sKey` or None
+        """
+        name = self._fieldDict.get(sKey)
+        return self._extra.get(sKey) if name is None else getattr(self, name)
+
+    def getEntry(self, sKey):
+        """ Returns `[type, count, value]` for key string `sKey`; raises
+            `KeyError`, if the key is not in the header
+        """
+        for k, tid, n in self._layout:
+            if k == sKey:
+                return [tid, n, self.get(sKey)]
+        raise KeyError(sKey)
+
+    def replace(self, sKey, v):
+        """ Returns a copy of the record with the value for key string `sKey`
+            replaced by `v`
+        """
+        kvPairDict = self.toKVPairs()
+        kvPairDict[sKey][2] = v
+        return self.__class__(kvPairDict)
+
+    def toKVPairs(self):
+        """ Returns the parameters as dict of `[type, count, value]` lists
+        """
+        return {k: [tid, n, self.get(k)] for k, tid, n in self._layout}
+
+
 # ----------------------------------------------------------------------------
 class SMH(object):
     """ Loads an `.smh` ScanM header file
@@ -27,12 +106,16 @@ class SMH(object):
         """ Resets object
         """
         self._SMHPreHdrDict = {}
-        self._kvPairDict = {}
+        self._kvPairs = {}
+        self._hdr = None
         self._fPath = ""
         self._isSMHReady = False
+        self._isPixBufCountCorrected = False
 
-    def loadSMH(self, fName, verbose=False):
+    def loadSMH(self, fName, verbose=False, cache=None):
         """ Load file `fName`
+            If `cache` is a `SMHCache`, the parsed header is taken from the cache,
+            if the file has not changed since it was stored, and stored otherwise
         """
         # Clear object if not empty
         if self._isSMHReady:
@@ -50,6 +133,17 @@ class SMH(object):
             self._fPath = fPath
 
         scm_log(f"Processing file `{fPathSMH}`")
+        if cache is not None:
+            key = cache.getKey(fPathSMH)
+            entry = cache.load(fPathSMH, key)
+            if entry is not None:
+                self._SMHPreHdrDict, self._hdr = entry
+                self._kvPairs = None
+                scm_log(f"{len(self._hdr)} parameter(s) taken from cache")
+                self._isSMHReady = True
+                scm_log("Done.")
+                return errC
+
         try:
             # Load pre-header into a dict
             scm_log("Loading pre-header ...")
@@ -60,42 +154,18 @@ class SMH(object):
             kvl = []
             key_w_err = []
             nkv = 0
-            done = False
 
             # Read all lines from header file
-            with open(fPathSMH, "rt", encoding='ISO-8859-1') as f:
-                # Jump the pre-header ...
-                f.seek(SCMIO_preHeaderSize_bytes)
-                while not (done):
-                    ln = f.readline()
-                    done = len(ln) == 0
-                    if not done:
-                        # Line with content
-                        # -> convert to normal string
-                        # (this is a bit complicated because of special characters,
-                        #  such as `µ`)
-                        buf = ln.encode("utf-8")
-                        tmp = ""
-                        ich = -1
-                        for j in range((len(buf) - 1) // 2):
-                            if buf[ich + 1] == 0:
-                                ich += 2
-                                tmp += chr(buf[ich])
-                            else:
-                                ich += 3
-                                tmp = tmp[:-1] + chr(buf[ich - 2]) + chr(buf[ich])
-
-                        s = "".join(tmp).split("\n")[0]
-                        if len(s) > 0 and s[0] != "\x00":
-                            # String is not empty and nd of file not reached
-                            # -> store string in list
-                            if verbose:
-                                scm_log(f"-> {nkv:5} {s}")
-                            kvl.append(s)
-                            nkv += 1
+            # (stored as UTF-16, decoded at once, which also handles special
+            #  characters, such as `µ`)
+            for s in scm_read_header_lines(fPathSMH):
+                if verbose:
+                    scm_log(f"-> {nkv:5} {s}")
+                kvl.append(s)
+                nkv += 1
             if nkv == 0:
                 errC = Err_SMH_NoParametersFound
-                scm_log(ERRStr(errC))
+                scm_log(ERRStr[errC])
                 return errC
 
             # Now parse the found key-value pairs
@@ -297,7 +367,13 @@ class SMH(object):
                 max(1, self.nImgPerFr)
             )
 
-            scm_log(f"{len(self._kvPairDict)} parameter(s) extracted")
+            # Freeze parameters into a compact header record
+            self._hdr = SMHRecord(self._kvPairs)
+            self._kvPairs = None
+
+            scm_log(f"{len(self._hdr)} parameter(s) extracted")
+            if cache is not None:
+                cache.store(fPathSMH, self._SMHPreHdrDict, self._hdr, key)
             self._isSMHReady = True
             scm_log("Done.")
 
@@ -309,6 +385,12 @@ class SMH(object):
     ''' General information
     '''
 
+    @property
+    def _kvPairDict(self):
+        # Parameters as dict of `[type, count, value]` lists (while parsing the
+        # header; afterwards a copy of the header record)
+        return self._kvPairs if self._hdr is None else self._hdr.toKVPairs()
+
     @property
     def GUID(self):
         return self._SMHPreHdrDict["GUID"]
@@ -326,26 +408,26 @@ class SMH(object):
 
     @property
     def scanMode(self):
-        return self.get(SCMIO_keys.USER_ScanMode)
+        return self._field("USER_ScanMode")
 
     @property
     def scanType(self):
-        return self.get(SCMIO_keys.USER_ScanType)
+        return self._field("USER_ScanType")
 
     ''' Pixel-related information
     '''
 
     @property
     def pixSize_byte(self):
-        return self.get(SCMIO_keys.PixelSizeInBytes)
+        return self._field("PixelSizeInBytes")
 
     @property
     def pixDurTarget_us(self):
-        return self.get(SCMIO_keys.TargetedPixDur)
+        return self._field("TargetedPixDur")
 
     @property
     def pixDur_us(self):
-        return self.get(SCMIO_keys.RealPixDur)
+        return self._field("RealPixDur")
 
     ''' Number of recorded frames
     '''
@@ -362,53 +444,53 @@ class SMH(object):
 
     @property
     def zoom(self):
-        return self.get(SCMIO_keys.USER_zoom)
+        return self._field("USER_zoom")
 
     ''' Parameters on frame structure
     '''
 
     @property
     def nPixBufPerFr(self):
-        return self.get(SCMIO_keys.USER_divFrameBufReq)
+        return self._field("USER_divFrameBufReq")
 
     @property
     def nStimBufPerFr(self):
-        return self.get(SCMIO_keys.USER_stimBufPerFr)
+        return self._field("USER_stimBufPerFr")
 
     @property
     def nImgPerFr(self):
-        return self.get(SCMIO_keys.USER_nImgPerFr)
+        return self._field("USER_nImgPerFr")
 
     ''' Frame dimensions
     '''
 
     @property
     def dxFr_pix(self):
-        return self.get(SCMIO_keys.USER_dxPix)
+        return self._field("USER_dxPix")
 
     @property
     def dyFr_pix(self):
-        return self.get(SCMIO_keys.USER_dyPix)
+        return self._field("USER_dyPix")
 
     @property
     def dzFr_pix(self):
-        return self.get(SCMIO_keys.USER_dzPix)
+        return self._field("USER_dzPix")
 
     @property
     def dxOffs_pix(self):
-        return self.get(SCMIO_keys.USER_nXPixLineOffs)
+        return self._field("USER_nXPixLineOffs")
 
     @property
     def dxRetrace_pix(self):
-        return self.get(SCMIO_keys.USER_nPixRetrace)
+        return self._field("USER_nPixRetrace")
 
     @property
     def dxFrDec_pix(self):
-        return self.get(SCMIO_keys.USER_dxFrDecoded)
+        return self._field("USER_dxFrDecoded")
 
     @property
     def dyFrDec_pix(self):
-        return self.get(SCMIO_keys.USER_dyFrDecoded)
+        return self._field("USER_dyFrDecoded")
 
     @dyFrDec_pix.setter
     def dyFrDec_pix(self, v):
@@ -416,37 +498,37 @@ class SMH(object):
 
     @property
     def dzFrDec_pix(self):
-        return self.get(SCMIO_keys.USER_dzFrDecoded)
+        return self._field("USER_dzFrDecoded")
 
     @property
     def aspectRatioFr(self):
-        return self.get(SCMIO_keys.USER_aspectRatioFrame)
+        return self._field("USER_aspectRatioFrame")
 
     ''' Stimulus-related
     '''
 
     @property
     def nStimBuf(self):
-        return self.get(SCMIO_keys.NumberOfStimBufs)
+        return self._field("NumberOfStimBufs")
 
     @property
     def stimChMask(self):
-        return self.get(SCMIO_keys.StimulusChannelMask)
+        return self._field("StimulusChannelMask")
 
     ''' Input-related
     '''
 
     @property
     def nInputCh(self):
-        return self.get(SCMIO_keys.NumberOfInputChans)
+        return self._field("NumberOfInputChans")
 
     @property
     def inputChMask(self):
-        return self.get(SCMIO_keys.InputChannelMask)
+        return self._field("InputChannelMask")
 
     @property
     def nPixBufsSet(self):
-        return self.get(SCMIO_keys.NumberOfPixBufsSet)
+        return self._field("NumberOfPixBufsSet")
 
     @nPixBufsSet.setter
     def nPixBufsSet(self, v):
@@ -454,7 +536,7 @@ class SMH(object):
 
     @property
     def pixBufCounter(self):
-        return self.get(SCMIO_keys.PixBufCounter)
+        return self._field("PixBufCounter")
 
     @pixBufCounter.setter
     def pixBufCounter(self, v):
@@ -462,7 +544,7 @@ class SMH(object):
 
     @property
     def pixBufLenList(self):
-        return self.get(SCMIO_keys.InChan_PixBufLenList)
+        return self._field("InChan_PixBufLenList")
 
     '''
     'StimBufLenList': [numpy.uint32, 3, array([5120, 5120, 5120])],
@@ -500,6 +582,156 @@ class SMH(object):
     'Header_length_in_bytes': [numpy.uint64, 1, 5362],
     '''
 
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def probe(self):
+        """ Derive the recording geometry and the expected sizes from the header and
+            the size of the pixel data file alone, w/o reading any pixel data;
+            returns an error code and a dict (or None) with the number of frames,
+            the recorded AI channels, the dtype, the (frame, line, pixel) shape of
+            each channel, uncropped and cropped to the imaging region, the bytes
+            per channel, and the expected and actual size of the `.smp` file.
+            If the pixel data file is truncated, `ERR_PixelDataTruncated` is
+            returned, and `nFrInFile` is the number of complete frames in it.
+            The number of frames is only returned in the dict; `nFr` is not set
+            until the pixel data is loaded (`SMP.loadSMP`).
+        """
+        if not self._isSMHReady:
+            scm_log(f"ERROR: Load `.smh` file first")
+            return ERR_InvalidSMHObject, None
+        fPathSMP = self._fPath + "." + SCMIO_pixelDataFileExtStr
+        if not os.path.exists(fPathSMP):
+            scm_log("ERROR: " + ERRStr[ERR_FileNotFound].format(fPathSMP))
+            return ERR_FileNotFound, None
+        if not (self.scanMode in [ScM_scanMode_XYImage]):
+            scm_log("ERROR: " + ERRStr[ERR_NotImplemented].format(ScM_scanModeStr[self.scanMode]))
+            return ERR_NotImplemented, None
+        errC, lay = self._getPixDataLayout()
+        if errC != ERR_Ok:
+            return errC, None
+
+        nFr, nPixPerFr, pixBLen = lay["nFr"], lay["nPixPerFr"], lay["pixBLen"]
+        bufLen_byte = lay["nAICh"] * pixBLen * self.pixSize_byte
+        pixDataLen_byte = lay["nPixB"] * bufLen_byte
+        fSize_byte = os.path.getsize(fPathSMP)
+
+        # Frames, which are completely contained in the pixel buffers of the file
+        # (in a complete file, the pixel data is followed by the post-header)
+        nPixBInFile = min(fSize_byte, pixDataLen_byte) // bufLen_byte
+        nFrInFile = min(nFr, nPixBInFile * pixBLen // nPixPerFr)
+
+        shape = (nFr, int(lay["dSlow1"] / lay["nImgPerFr"]), lay["dFast"])
+        cropShape = shape[:2] + (lay["dFast"] - lay["nFastPixOff"] - lay["nFastPixRetr"],)
+        info = {
+            "nFr": nFr, "nFrInFile": nFrInFile,
+            "channels": [i for i in range(SCMIO_maxInputChans) if self.inputChMask & (2 ** i)],
+            "dtype": np.dtype(lay["dtype"]),
+            "shape": shape, "croppedShape": cropShape,
+            "bytesPerChannel": int(np.prod(shape)) * self.pixSize_byte,
+            "croppedBytesPerChannel": int(np.prod(cropShape)) * self.pixSize_byte,
+            "pixDataLen_byte": pixDataLen_byte,
+            "fileSize_byte": fSize_byte,
+            "isComplete": fSize_byte >= pixDataLen_byte + SCMIO_preHeaderSize_bytes
+        }
+        if not info["isComplete"]:
+            scm_log("ERROR: " + ERRStr[ERR_PixelDataTruncated].format(fPathSMP) +
+                    f" ({fSize_byte} of {pixDataLen_byte + SCMIO_preHeaderSize_bytes} bytes,"
+                    f" {nFrInFile} of {nFr} frame(s))")
+            return ERR_PixelDataTruncated, info
+        return ERR_Ok, info
+
+    def _getPixDataLayout(self):
+        """ Determine the organisation of the pixel data in the `.smp` file from the
+            header; returns an error code and a dict with the layout
+        """
+        # Get some scanMode-related parameters
+        nFrPerStep = self.get(SCMIO_keys.USER_NFrPerStep)
+        isAvZStack = self.scanType == ScM_scanType_zStack and nFrPerStep > 1
+        nFrPerStep = nFrPerStep if isAvZStack else 1
+
+        errC = ERR_Ok
+        if self.scanMode in [ScM_scanMode_XYImage, ScM_scanMode_TrajectArb]:
+            dFast = self.dxFr_pix
+            nFastPixRetr = self.dxRetrace_pix
+            nFastPixOff = self.dxOffs_pix
+            dSlow1 = self.dyFr_pix if self.dyFr_pix > 0 else 1
+            dSlow2 = self.dzFr_pix if self.dzFr_pix > 0 else 1
+            if self.scanMode == ScM_scanMode_TrajectArb:
+                # ***************
+                # ***************
+                # TODO
+                # ***************
+                # ***************
+                pass
+
+        # ***************
+        # ***************
+        # TODO
+        elif self.scanMode == ScM_scanMode_XZYImage:
+            errC = ERR_NotImplemented
+            """
+    dFast = pwNP[%User_dxPix]
+    nFastPixRetr = pwNP[%User_nPixRetrace]
+    nFastPixOff = pwNP[%User_nXPixLineOffs]
+    dSlow1 = pwNP[%User_dzPix]
+    dSlow2 = pwNP[%User_dyPix]
+        """
+        elif self.scanMode == ScM_scanMode_ZXYImage:
+            errC = ERR_NotImplemented
+            """
+    dFast = pwNP[%User_dzPix]
+    nFastPixRetr = pwNP[%User_nPixRetrace]
+    nFastPixOff = pwNP[%User_nZPixLineOffs]
+    dSlow1 = pwNP[%User_dxPix]
+    dSlow2 = pwNP[%User_dyPix]
+        """
+        # ***************
+        # ***************
+        else:
+            errC = ERR_UnknownScanMode
+
+        if errC != ERR_Ok:
+            s = "ERROR: " + ERRStr[errC]
+            if errC == ERR_NotImplemented:
+                s = s.format(ScM_scanModeStr[self.scanMode])
+            scm_log(s)
+            return errC, None
+
+        # Check pixel size
+        assert self.pixSize_byte in [2, 8], "ABORT: Invalid pixel size"
+        _dtype = np.double if self.pixSize_byte == 8 else np.uint16
+
+        # Correct number of pixel buffers, because it is not correctly reported
+        # by the ScanM.dll if one stimulus buffer contained the data for multiple
+        # frames (i.e. cp.stimBufPerFr != 1)
+        # (only once, also if the pixel data is loaded repeatedly)
+        if self.nStimBufPerFr > 0 and not self._isPixBufCountCorrected:
+            self.nPixBufsSet *= self.nStimBufPerFr
+            self.pixBufCounter *= self.nStimBufPerFr
+            self._isPixBufCountCorrected = True
+
+        # Determine some parameters
+        pixBLen = self.pixBufLenList[0]
+        nPixPerFr = dFast * dSlow1 * dSlow2
+        nBufPerFr = nPixPerFr / pixBLen
+        if self.nPixBufsSet == self.pixBufCounter:
+            nPixB = self.nPixBufsSet * nBufPerFr
+        else:
+            nPixB = (self.nPixBufsSet - self.pixBufCounter) * nBufPerFr
+        nPixB = int(nPixB * nFrPerStep)
+        nAICh = int(self.nInputCh)
+        nImgPerFr = max(1, self.nImgPerFr)
+        nFr = int((nPixB / nFrPerStep * pixBLen) / nPixPerFr * nImgPerFr)
+        assert nImgPerFr == 1, "ABORT: `nImgPerFr` larger than 1??"
+
+        return errC, {
+            "dFast": dFast, "nFastPixRetr": int(nFastPixRetr), "nFastPixOff": int(nFastPixOff),
+            "dSlow1": dSlow1, "dSlow2": dSlow2,
+            "dtype": _dtype, "pixBLen": int(pixBLen), "nPixPerFr": int(nPixPerFr),
+            "nBufPerFr": nBufPerFr, "nPixB": nPixB, "nAICh": nAICh,
+            "nImgPerFr": nImgPerFr, "nFrPerStep": nFrPerStep, "isAvZStack": isAvZStack,
+            "nFr": nFr
+        }
+
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
     def summary(self):
         print(f"Summary")
@@ -524,9 +756,16 @@ class SMH(object):
     def get(self, key, index=-1, remove=False):
         """ Get value for given key
         """
+        hdr = self._hdr
+        if hdr is not None and index < 0 and not remove:
+            # Header record, the value is directly accessible
+            if key.__class__ is SCMIO_keys:
+                return getattr(hdr, key.name)
+            return hdr.get(key)
+
         key = key if isinstance(key, str) else key.value
         try:
-            val = self._kvPairDict[key]
+            val = self._kvPairs[key] if hdr is None else hdr.getEntry(key)
             if index < 0:
                 res = val[2]
             else:
@@ -537,19 +776,32 @@ class SMH(object):
                     assert index >= 0 and index < val[1], "Index out of range"
                     res = val[2] if val[1] == 1 else val[2][index]
             if remove:
-                _ = self._kvPairDict.pop(key)
+                assert hdr is None, "Header record is read-only"
+                _ = self._kvPairs.pop(key)
             return res
         except KeyError:
             return None
 
+    def _field(self, name):
+        """ Get value for the `SCMIO_keys` member `name`; w/o `SCMIO_keys` member
+            lookup, if the header record exists (for frequently used properties)
+        """
+        hdr = self._hdr
+        return getattr(hdr, name) if hdr is not None else self.get(SCMIO_keys[name])
+
     def set(self, key, val):
         """ Set new value for given key
         """
         key = key if isinstance(key, str) else key.value
         try:
-            data = self._kvPairDict[key]
-            data[2] = val
-            self._kvPairDict[key] = data
+            if self._hdr is not None:
+                if key not in self._hdr:
+                    raise KeyError(key)
+                self._hdr = self._hdr.replace(key, val)
+            else:
+                data = self._kvPairs[key]
+                data[2] = val
+                self._kvPairs[key] = data
         except KeyError:
             scm_log(f"ERROR: Key `{key}` not found ")
 
@@ -0,0 +1,159 @@
+# ----------------------------------------------------------------------------
+# scanm_smh_cache.py
+# Persistent on-disk cache for parsed ScanM header files (`.smh`)
+#
+# The MIT License (MIT)
+# (c) Copyright 2022-23 Thomas Euler, Jonathan Oesterle
+#
+# 2026-10-14, first implementation
+# ----------------------------------------------------------------------------
+import hashlib
+import os
+import pickle
+import tempfile
+
+from .scanm_global import *
+
+# Default location and maximal size of the cache
+SCMIO_SMHCacheDir = os.path.join(os.path.expanduser("~"), ".cache", "scanmsupport", "smh")
+SCMIO_SMHCacheMaxSize_bytes = 2 ** 27
+# Fraction of the maximal size the cache is reduced to, when it is exceeded
+SCMIO_SMHCacheLowWater = 0.9
+SCMIO_SMHCacheFileExtStr = "pkl"
+
+
+# ----------------------------------------------------------------------------
+class SMHCache(object):
+    """ Stores the parsed pre-header and header record of `.smh` files in the
+        directory `dirPath`, one file per header, keyed by the file path, size,
+        modification time and the GUID in the pre-header. A changed header file
+        therefore never hits an old entry.
+        Entries are written to a temporary file and then renamed, hence several
+        processes can share the cache w/o locking; readers see either a complete
+        entry or none. If the cache grows beyond `maxSize_bytes`, the least
+        recently used entries are removed, down to `SCMIO_SMHCacheLowWater` of
+        `maxSize_bytes`. The cache directory is only scanned for this when the
+        size estimate of this process (from the last scan plus the entries
+        stored since) exceeds `maxSize_bytes`.
+    """
+
+    def __init__(self, dirPath=None, maxSize_bytes=SCMIO_SMHCacheMaxSize_bytes):
+        self._dirPath = SCMIO_SMHCacheDir if dirPath is None else str(dirPath)
+        self._maxSize_bytes = maxSize_bytes
+        self.nHits = 0
+        self.nMisses = 0
+        self.nScans = 0
+        self._size_bytes = None
+        os.makedirs(self._dirPath, exist_ok=True)
+
+    @property
+    def dirPath(self):
+        return self._dirPath
+
+    def getKey(self, fPathSMH):
+        """ Returns the key of the header file `fPathSMH` (complete path w/
+            extension) in its current state
+        """
+        st = os.stat(fPathSMH)
+        GUID = scm_load_pre_header(fPathSMH)["GUID"]
+        return (os.path.abspath(fPathSMH), st.st_size, st.st_mtime_ns, GUID)
+
+    def _getEntryPath(self, key):
+        h = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self._dirPath, h + "." + SCMIO_SMHCacheFileExtStr)
+
+    def load(self, fPathSMH, key=None):
+        """ Returns the pre-header dict and header record (`SMHRecord`) of the
+            header file `fPathSMH`, or None if it is not in the cache
+        """
+        try:
+            key = self.getKey(fPathSMH) if key is None else key
+            fPathEntry = self._getEntryPath(key)
+            with open(fPathEntry, "rb") as f:
+                entry = pickle.load(f)
+            if entry["key"] != key:
+                raise KeyError(key)
+            # Mark entry as recently used
+            os.utime(fPathEntry)
+        except FileNotFoundError:
+            self.nMisses += 1
+            return None
+        except Exception as e:
+            # Unreadable or foreign entry, parse the header again
+            scm_log(f"WARNING: Ignoring cache entry for `{fPathSMH}` ({type(e).__name__})")
+            self.nMisses += 1
+            return None
+        self.nHits += 1
+        return entry["preHdr"], entry["hdr"]
+
+    def store(self, fPathSMH, preHdrDict, hdr, key=None):
+        """ Store the pre-header dict and header record `hdr` of the header file
+            `fPathSMH`; `key` is the key when the file was read (see `getKey`),
+            if the file has changed since, nothing is stored
+        """
+        if key is None:
+            key = self.getKey(fPathSMH)
+        elif self.getKey(fPathSMH) != key:
+            return
+        entry = {"key": key, "preHdr": preHdrDict, "hdr": hdr}
+        fd, fPathTmp = tempfile.mkstemp(dir=self._dirPath, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+                n = f.tell()
+            fPathEntry = self._getEntryPath(key)
+            os.replace(fPathTmp, fPathEntry)
+        except BaseException:
+            try:
+                os.remove(fPathTmp)
+            except OSError:
+                pass
+            raise
+        if self._size_bytes is None or self._size_bytes + n > self._maxSize_bytes:
+            self._size_bytes = self._evict(keep=os.path.basename(fPathEntry))
+        else:
+            self._size_bytes += n
+
+    def _evict(self, keep=""):
+        """ Scan the cache; if it is larger than `maxSize_bytes`, remove least
+            recently used entries except `keep`, until it is not larger than
+            `SCMIO_SMHCacheLowWater` of `maxSize_bytes`. Returns the size of
+            the cache
+        """
+        self.nScans += 1
+        entries = []
+        for fName in os.listdir(self._dirPath):
+            if fName.endswith("." + SCMIO_SMHCacheFileExtStr):
+                try:
+                    st = os.stat(os.path.join(self._dirPath, fName))
+                    entries.append((st.st_mtime_ns, st.st_size, fName))
+                except FileNotFoundError:
+                    # Removed by another process
+                    pass
+        size_bytes = sum(e[1] for e in entries)
+        if size_bytes <= self._maxSize_bytes:
+            return size_bytes
+        for _, n, fName in sorted(entries):
+            if size_bytes <= self._maxSize_bytes * SCMIO_SMHCacheLowWater:
+                break
+            if fName == keep:
+                continue
+            try:
+                os.remove(os.path.join(self._dirPath, fName))
+            except FileNotFoundError:
+                pass
+            size_bytes -= n
+        return size_bytes
+
+    def clear(self):
+        """ Remove all entries
+        """
+        for fName in os.listdir(self._dirPath):
+            if fName.endswith("." + SCMIO_SMHCacheFileExtStr):
+                try:
+                    os.remove(os.path.join(self._dirPath, fName))
+                except FileNotFoundError:
+                    pass
+        self._size_bytes = 0
+
+# ----------------------------------------------------------------------------
@@ -9,6 +9,11 @@
 # 2023-06-16, changes to cope with older files
 # -------------------------------------------------------------------------------------------
 import os.path
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
@@ -17,6 +22,84 @@ from .scanm_smh import SMH
 from .scanm_stim_buf import StimBuf
 
 
+# -------------------------------------------------------------------------------------------
+class SMPChannelMap(object):
+    """ Lazy (frame, line, pixel) view of one AI channel in a memory-mapped `.smp` file
+
+    `wPixB` is a strided (buffer, line, pixel) view of the channel in the mapped
+    file. Since the pixel buffers of the AI channels are interleaved, a frame that
+    spans several buffers cannot be expressed as a single strided array; lines are
+    therefore looked up buffer by buffer when indexing. Indexing with slices only
+    returns another `SMPChannelMap` (like a numpy view), any other index reads the
+    selected pixels into an `ndarray`. Use `np.asarray()` to read the whole view.
+  """
+
+    def __init__(self, wPixB, nLinesPerFr, nFr, frames=None, lines=None, pixels=None):
+        self._wPixB = wPixB
+        self._nLinesPerFr = nLinesPerFr
+        self._frames = range(nFr) if frames is None else frames
+        self._lines = range(nLinesPerFr) if lines is None else lines
+        self._pixels = range(wPixB.shape[2]) if pixels is None else pixels
+
+    @property
+    def shape(self):
+        return len(self._frames), len(self._lines), len(self._pixels)
+
+    @property
+    def ndim(self):
+        return 3
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def dtype(self):
+        return self._wPixB.dtype
+
+    def __len__(self):
+        return len(self._frames)
+
+    def _expandKey(self, key):
+        key = key if isinstance(key, tuple) else (key,)
+        iEll = [i for i, k in enumerate(key) if k is Ellipsis]
+        if len(iEll) > 0:
+            i = iEll[0]
+            key = key[:i] + (slice(None),) * (4 - len(key)) + key[i + 1:]
+        assert len(key) <= 3, "Too many indices"
+        return key + (slice(None),) * (3 - len(key))
+
+    def __getitem__(self, key):
+        key = self._expandKey(key)
+        if all(isinstance(k, slice) for k in key):
+            # Only slices -> return a view
+            return SMPChannelMap(
+                self._wPixB, self._nLinesPerFr, 0,
+                frames=self._frames[key[0]],
+                lines=self._lines[key[1]],
+                pixels=self._pixels[key[2]]
+            )
+
+        # Read the selected pixels; lines are counted continuously over the frames
+        # and mapped to pixel buffers
+        fr = np.asarray(self._frames, dtype=np.int64)[key[0]]
+        ln = np.asarray(self._lines, dtype=np.int64)[key[1]]
+        px = np.asarray(self._pixels, dtype=np.int64)[key[2]]
+        nLinesPerB = self._wPixB.shape[1]
+        iLn = np.add.outer(fr * self._nLinesPerFr, ln)
+        iPixB, iLnInB = iLn // nLinesPerB, iLn % nLinesPerB
+        if np.ndim(px) > 0:
+            iPixB, iLnInB = iPixB[..., np.newaxis], iLnInB[..., np.newaxis]
+        return np.asarray(self._wPixB[iPixB, iLnInB, px])
+
+    def __array__(self, dtype=None, copy=None):
+        a = self[:, :, np.arange(len(self._pixels))]
+        return a if dtype is None else a.astype(dtype)
+
+    def __repr__(self):
+        return f"<SMPChannelMap {self.shape} {self.dtype}>"
+
+
 # -------------------------------------------------------------------------------------------
 class SMP(SMH):
     """ Loads `.smp` ScanM pixel data file (for a specific `.smh` header file)
@@ -28,22 +111,48 @@ class SMP(SMH):
 
     def _reset(self):
         """ Resets object
+    """
+        self._resetSMP()
+        super()._reset()
+
+    def _resetSMP(self):
+        """ Resets only the pixel data, keeps the header
     """
         self._isSMPReady = False
         self._SMPPreHdrDict = dict()
-        super()._reset()
+        self._wPixData = None
+        self._chIndexDict = dict()
+        self._frRange = range(0)
+        self._readStatsDict = dict()
 
     '''
   Inherited:
   def loadSMH(self, fName, verbose=False):  
   '''
 
-    def loadSMP(self, verbose=False):
+    def loadSMP(self, verbose=False, mmap=False, channels=None, frames=None, workers=1,
+                readAhead=0):
         """ Load pixel data file for the respective `smh` object
+
+        If `mmap` is True, the pixel data is not read but memory-mapped; each AI
+        channel is then a lazy `SMPChannelMap` that only reads the pages which are
+        actually indexed.
+        `channels` is an optional list of AI channels to load (e.g. `[0, 2]`); the
+        pixel buffers are still read in large blocks, but only the selected channels
+        are kept in memory.
+        `frames` is an optional slice of frames to load (e.g. `slice(0, 500)`);
+        only the pixel buffers that contain these frames are read.
+        With `workers` > 1, blocks of pixel buffers are read and split into the AI
+        channels by a pool of threads, which keeps several reads outstanding (e.g.
+        on network file systems).
+        With `readAhead` > 0 (and a single worker), a background thread reads up to
+        `readAhead` blocks ahead into a ring of preallocated block buffers, while the
+        current block is split into the AI channels; reading and splitting then
+        overlap. The achieved read throughput is logged and kept in `readStats`.
     """
-        # Clear object if not empty
+        # Clear pixel data if not empty
         if self._isSMPReady:
-            self._reset()
+            self._resetSMP()
 
         # Some first error checking
         if not self._isSMHReady:
@@ -77,11 +186,6 @@ class SMP(SMH):
         # Get stim buffer information
         self._StimBuf = StimBuf(self)
 
-        # Get some scanMode-related parameters
-        nFrPerStep = self.get(SCMIO_keys.USER_NFrPerStep)
-        isAvZStack = self.scanType == ScM_scanType_zStack and nFrPerStep > 1
-        nFrPerStep = nFrPerStep if isAvZStack else 1
-
         errC = ERR_Ok
         scm_log(f"Processing file `{fPathSMP}`")
         try:
@@ -102,78 +206,26 @@ class SMP(SMH):
                 scm_log(f"WARNING: GUID mismatch {gh} != {gp}")
 
             # Prepare reading pixel data
-            errC = ERR_Ok
-            if self.scanMode in [ScM_scanMode_XYImage, ScM_scanMode_TrajectArb]:
-                dFast = self.dxFr_pix
-                nFastPixRetr = self.dxRetrace_pix
-                nFastPixOff = self.dxOffs_pix
-                dSlow1 = self.dyFr_pix if self.dyFr_pix > 0 else 1
-                dSlow2 = self.dzFr_pix if self.dzFr_pix > 0 else 1
-                if self.scanMode == ScM_scanMode_TrajectArb:
-                    # ***************
-                    # ***************
-                    # TODO
-                    # ***************
-                    # ***************
-                    pass
-
-            # ***************
-            # ***************
-            # TODO
-            elif self.scamMode == ScM_scanMode_XZYImage:
-                errC = ERR_NotImplemented
-                """
-        dFast = pwNP[%User_dxPix]
-        nFastPixRetr = pwNP[%User_nPixRetrace]
-        nFastPixOff = pwNP[%User_nXPixLineOffs]
-        dSlow1 = pwNP[%User_dzPix]
-        dSlow2 = pwNP[%User_dyPix]
-        """
-            elif self.scamMode == ScM_scanMode_ZXYImage:
-                errC = ERR_NotImplemented
-                """
-        dFast = pwNP[%User_dzPix]
-        nFastPixRetr = pwNP[%User_nPixRetrace]
-        nFastPixOff = pwNP[%User_nZPixLineOffs]
-        dSlow1 = pwNP[%User_dxPix]
-        dSlow2 = pwNP[%User_dyPix]
-        """
-            # ***************
-            # ***************
-            else:
-                errC = ERR_UnknownScanMode
-
+            errC, lay = self._getPixDataLayout()
             if errC != ERR_Ok:
-                s = "ERROR: " + ERRStr[errC]
-                if errC == ERR_NotImplemented:
-                    s = s.format(ScM_scanModeStr[self.scanMode])
-                scm_log(s)
                 return errC
-
-            # Check pixel size
-            assert self.pixSize_byte in [2, 8], "ABORT: Invalid pixel size"
-            _dtype = np.double if self.pixSize_byte == 8 else np.uint16
-
-            # Correct number of pixel buffers, because it is not correctly reported
-            # by the ScanM.dll if one stimulus buffer contained the data for multiple
-            # frames (i.e. cp.stimBufPerFr != 1)
-            if self.nStimBufPerFr > 0:
-                self.nPixBufsSet *= self.nStimBufPerFr
-                self.pixBufCounter *= self.nStimBufPerFr
-
-            # Determine some parameters
-            pixBLen = self.pixBufLenList[0]
-            nPixPerFr = dFast * dSlow1 * dSlow2
-            nBufPerFr = nPixPerFr / pixBLen
-            if self.nPixBufsSet == self.pixBufCounter:
-                nPixB = self.nPixBufsSet * nBufPerFr
-            else:
-                nPixB = (self.nPixBufsSet - self.pixBufCounter) * nBufPerFr
-            nPixB = int(nPixB * nFrPerStep)
-            nAICh = int(self.nInputCh)
-            nImgPerFr = max(1, self.nImgPerFr)
-            self._nFr = int((nPixB / nFrPerStep * pixBLen) / nPixPerFr * nImgPerFr)
-            assert nImgPerFr == 1, "ABORT: `nImgPerFr` larger than 1??"
+            dFast, dSlow1, dSlow2 = lay["dFast"], lay["dSlow1"], lay["dSlow2"]
+            nFastPixRetr, nFastPixOff = lay["nFastPixRetr"], lay["nFastPixOff"]
+            pixBLen, nPixB = lay["pixBLen"], lay["nPixB"]
+            nAICh, nImgPerFr, _dtype = lay["nAICh"], lay["nImgPerFr"], lay["dtype"]
+            nFrPerStep, isAvZStack = lay["nFrPerStep"], lay["isAvZStack"]
+            self._nFr = lay["nFr"]
+
+            # Select the frames to load and determine the pixel buffers that contain
+            # them (a frame can span several buffers or a buffer several frames)
+            frRange = range(self._nFr) if frames is None else range(self._nFr)[frames]
+            if len(frRange) == 0 or frRange.step < 0:
+                scm_log("ERROR: " + ERRStr[ERR_InvalidFrameRange].format(frames))
+                return ERR_InvalidFrameRange
+            nFrLoad = len(frRange)
+            iPixBList, iPixFrStart = self._getPixBufList(lay, frRange)
+            if frames is not None:
+                scm_log(f"Loading {nFrLoad} of {self._nFr} frame(s) ({frRange.start}..{frRange[-1]})")
 
             # Correct decoded frame size in case of bidrectional scans
             if nImgPerFr > 1:
@@ -186,6 +238,17 @@ class SMP(SMH):
             nPixDecFr = dxFrDec * dyFrDec  # *dzFrDec
 
             scm_log(f"{nAICh} AI channel(s) ({self.inputChMask:#04b})")
+
+            # Select the AI channels to load
+            loadChMask = self.inputChMask
+            if channels is not None:
+                loadChMask = 0
+                for iInCh in channels:
+                    if not self.inputChMask & (2 ** iInCh):
+                        scm_log("ERROR: " + ERRStr[ERR_ChannelNotRecorded].format(iInCh))
+                        return ERR_ChannelNotRecorded
+                    loadChMask |= 2 ** iInCh
+                scm_log(f"Loading AI channel(s) {loadChMask:#04b}")
             scm_log(f"{nPixB:.0f} of {self.nPixBufsSet} buffer(s) (each {pixBLen} pixels) "
                     "per channel")
 
@@ -203,176 +266,228 @@ class SMP(SMH):
                 scm_log("ERROR: " + ERRStr[ERR_NotImplemented].format("Pixel decoding"))
                 return ERR_NotImplemented
 
-            self._wPixData = []
             self._wDataCh = []
             self._wDecode = np.zeros(nPixDecFr) if self._hasDecoded else None
             self._wDecodeAv = np.zeros(nPixDecFr) if self._hasDecoded else None
 
+            # Original explanation:
+            # "wDataChx_raw" contains the raw pixel data, "wDataChx" the decoded pixel
+            # data that can be directly used for traditional preprocessing. With standard
+            # xy scans, raw and decoded are the same (or for scan path functions that
+            # just resort the pixel data), therefore no "wDataChx_raw" wave
+            # are created
+            # -> pwPixData
+            # (The pixel data of all loaded AI channels is kept in a single (channel,
+            #  buffer, pixel) array, reshaped to (channel, frame, line, pixel) after
+            #  reading; `_chIndexDict` maps each AI channel to its index in this array.
+            #  If memory-mapped, `_wPixData` is instead a list of channel maps, which
+            #  are created below)
+            self._chIndexDict = dict()
             for iInCh in range(SCMIO_maxInputChans):
-                if self.inputChMask & (2 ** iInCh):
-                    # Original explanation:
-                    # "wDataChx_raw" contains the raw pixel data, "wDataChx" the decoded pixel
-                    # data that can be directly used for traditional preprocessing. With standard
-                    # xy scans, raw and decoded are the same (or for scan path functions that
-                    # just resort the pixel data), therefore no "wDataChx_raw" wave
-                    # are created
-                    # -> pwPixData
-                    n = int(nPixB / nFrPerStep * pixBLen)
-                    self._wPixData.append([iInCh, np.zeros(n, _dtype)])
+                if loadChMask & (2 ** iInCh):
+                    self._chIndexDict[iInCh] = len(self._chIndexDict)
                     if self._hasDecoded:
                         self._wDataCh.append([iInCh, np.zeros((dxFrDec, dyFrDec, self._nFr))])
+            if mmap:
+                self._wPixData = []
+            else:
+                self._wPixData = np.zeros(
+                    (len(self._chIndexDict), int(len(iPixBList) / nFrPerStep), pixBLen), _dtype
+                )
+
+            # Read pixel data in blocks of pixel buffers into the AI channel waves
+            # (each read path opens its own unbuffered file handle)
+            isExtSPF = self._StimBuf.isExtScanFunction
+            isDecoded = self._StimBuf.pixDecodeMode == ScM_PixDataDecoded
+            wTempMoreParam = [0] * 7
+
+            if isAvZStack:
+                # Is z-stack with more than one frame per step, requires
+                # averaging ...
+                # ***************
+                # ***************
+                # TODO
+                # ***************
+                # ***************
+                scm_log("ERROR: " + ERRStr[ERR_NotImplemented].format("Z-stacks"))
+                return ERR_NotImplemented
 
-            # Read pixel data
-            with open(fPathSMP, "rb") as f:
-                # Load pixel data buffer by buffer in the AI channel waves
-                iPixB = 0
-                iPixBAllCh = 0
-                iAvFr = 0
-                isExtSPF = self._StimBuf.isExtScanFunction
-                isDecoded = self._StimBuf.pixDecodeMode == ScM_PixDataDecoded
-                wTempMoreParam = [0] * 7
-
-                if isAvZStack:
-                    # Is z-stack with more than one frame per step, requires
-                    # averaging ...
-                    # ***************
-                    # ***************
-                    # TODO
-                    # ***************
-                    # ***************
-                    scm_log("ERROR: " + ERRStr[ERR_NotImplemented].format("Z-stacks"))
-                    return ERR_NotImplemented
-
-                else:
-                    # w/o frame averaging (as usual)
-                    npx = int(pixBLen * nAICh)
-                    sup = f"{npx}H" if self.pixSize_byte == 2 else f"{npx}d"
-
-                    iPixBPerCh = 0
-                    eof = False
-                    for iPixBPerCh in range(nPixB):
-                        # Read next pixel buffer (containing all AI channels)
-                        _size_req = npx * self.pixSize_byte
-                        buf = f.read(_size_req)
-                        _size_read = len(buf)
-                        eof = _size_read < _size_req
-                        if eof:
-                            # End of file reached ...
-                            assert False, "ABORT: End of .smp file, should not happen ..."
-
-                        self._wPixBAllCh = np.array(struct.unpack(sup, buf))
-                        iCh = 0
-                        for iInCh in range(SCMIO_maxInputChans):
-                            if self.inputChMask & (2 ** iInCh):
-                                self._wPixB = np.array(self._wPixBAllCh[iCh * pixBLen:(iCh + 1) * pixBLen])
-                                if self._hasDecoded or not (self._StimBuf.isExtScanFunction):
-                                    # Standard scan path function was used or external scan path function
-                                    # with pixel decoding
-                                    j = 0
-                                    while not self._wPixData[j][0] == iInCh and j < SCMIO_maxInputChans: j += 1
-                                    m = iPixBPerCh * pixBLen
-                                    n = (iPixBPerCh + 1) * pixBLen
-                                    self._wPixData[j][1][m:n] = self._wPixB[:]
-
-                                if self._StimBuf.isExtScanFunction:
-                                    # External scan path function, therefore call the decoder to fill
-                                    # the second set of pixel data waves
-                                    # ***************
-                                    # ***************
-                                    # TODO
-                                    # ***************
-                                    # ***************
-                                    scm_log("ERROR: " + ERRStr[ERR_NotImplemented].format("External decoder functions"))
-                                    return ERR_NotImplemented
-                                    '''
-                  wTempMoreParam[0] = nAICh
-                  wTempMoreParam[1] = iCh
-                  wTempMoreParam[2] = iPixBAllCh *PixBLen
-                  wTempMoreParam[3] = nPixPerFr	 /nImgPerFr
-                  wTempMoreParam[4] = PixBLen
-                  wTempMoreParam[5] = 1
-                  wTempMoreParam[6] = 0
-                  fDecode(wDecode, wDecodeAv, pwPixBAllCh, "root:" +sDFName +":", wTempMoreParam)
-
-                  // Copy pixel data from temporary frame into pixel data wave
+            elif isExtSPF:
+                # External scan path function, therefore call the decoder to fill
+                # the second set of pixel data waves
+                # ***************
+                # ***************
+                # TODO
+                # ***************
+                # ***************
+                scm_log("ERROR: " + ERRStr[ERR_NotImplemented].format("External decoder functions"))
+                return ERR_NotImplemented
+                '''
+                wTempMoreParam[0] = nAICh
+                wTempMoreParam[1] = iCh
+                wTempMoreParam[2] = iPixBAllCh *PixBLen
+                wTempMoreParam[3] = nPixPerFr	 /nImgPerFr
+                wTempMoreParam[4] = PixBLen
+                wTempMoreParam[5] = 1
+                wTempMoreParam[6] = 0
+                fDecode(wDecode, wDecodeAv, pwPixBAllCh, "root:" +sDFName +":", wTempMoreParam)
+
+                // Copy pixel data from temporary frame into pixel data wave
+                //
+                sprintf sWave, sPixDataDecodeFormat, iInCh
+                wave pwPixData = $(sWave)
+
+                if(isDecoded)
+                  // Decoder decoded/reconstructed the data (non loss-less)
                   //
-                  sprintf sWave, sPixDataDecodeFormat, iInCh
-                  wave pwPixData = $(sWave)
-
-                  if(isDecoded)
-                    // Decoder decoded/reconstructed the data (non loss-less)
-                    //
-                    Redimension/E=1/N=(dxFrDecode, dyFrDecode) wDecode
-                    iImg = trunc(iPixBPerCh /(nBufPerFr *nImgPerFr))
-                    pwPixData[][][iImg] = wDecode[p][q]
-                    Redimension/E=1/N=(dxFrDecode *dyFrDecode) wDecode
+                  Redimension/E=1/N=(dxFrDecode, dyFrDecode) wDecode
+                  iImg = trunc(iPixBPerCh /(nBufPerFr *nImgPerFr))
+                  pwPixData[][][iImg] = wDecode[p][q]
+                  Redimension/E=1/N=(dxFrDecode *dyFrDecode) wDecode
 
+                else
+                  // Decoder just resorted the pixel data
+                  //
+                  Redimension/E=1/N=(dxFrDecode *dyFrDecode *nFr *nImgPerFr) pwPixData
+                  isFlipped = (mod(trunc(iPixBPerCh /nImgPerFr), 2) && (nImgPerFr > 1))
+                  iBufInImg = mod(iPixBPerCh, nBufPerFr /nImgPerFr)
+                  if(isFlipped)
+                    m = (iPixBPerCh +1 -iBufInImg*2) *PixBLen
+                    n = m +PixBLen -1
+                    offsInBuf = mod(iPixBPerCh +1, nBufPerFr/nImgPerFr)*PixBLen
                   else
-                    // Decoder just resorted the pixel data
-                    //
-                    Redimension/E=1/N=(dxFrDecode *dyFrDecode *nFr *nImgPerFr) pwPixData
-                    isFlipped = (mod(trunc(iPixBPerCh /nImgPerFr), 2) && (nImgPerFr > 1))
-                    iBufInImg = mod(iPixBPerCh, nBufPerFr /nImgPerFr)
-                    if(isFlipped)
-                      m = (iPixBPerCh +1 -iBufInImg*2) *PixBLen
-                      n = m +PixBLen -1
-                      offsInBuf = mod(iPixBPerCh +1, nBufPerFr/nImgPerFr)*PixBLen
-                    else
-                      m = iPixBPerCh *PixBLen
-                      n = m +PixBLen -1
-                      offsInBuf = iBufInImg *PixBLen
-                    endif
-
-                    pwPixData[m,n] = wDecode[p -m +offsInBuf]
-                    Redimension/E=1/N=(dxFrDecode, dyFrDecode, nFr *nImgPerFr) pwPixData
+                    m = iPixBPerCh *PixBLen
+                    n = m +PixBLen -1
+                    offsInBuf = iBufInImg *PixBLen
                   endif
+
+                  pwPixData[m,n] = wDecode[p -m +offsInBuf]
+                  Redimension/E=1/N=(dxFrDecode, dyFrDecode, nFr *nImgPerFr) pwPixData
                 endif
                 '''
-                                iPixB += 1
-                                iCh += 1
 
-                        iPixBAllCh += 1
+            elif mmap:
+                # w/o frame averaging, memory-mapped
+                # (The data file is mapped as (buffer, channel, pixel) array; if the
+                #  pixel buffers contain complete scan lines, each AI channel is a
+                #  strided (buffer, line, pixel) view into this map)
+                if pixBLen % dFast != 0:
+                    scm_log("ERROR: " + ERRStr[ERR_NotImplemented].format(
+                        "Memory-mapping of pixel buffers with incomplete lines"
+                    ))
+                    return ERR_NotImplemented
+
+                wPixBAllCh = np.memmap(
+                    fPathSMP, dtype=_dtype, mode="r", shape=(nPixB, nAICh, pixBLen)
+                )
+                iCh = 0
+                for iInCh in range(SCMIO_maxInputChans):
+                    if self.inputChMask & (2 ** iInCh):
+                        if loadChMask & (2 ** iInCh):
+                            wPixB = wPixBAllCh[:, iCh, :].reshape(nPixB, pixBLen // dFast, dFast)
+                            self._wPixData.append(SMPChannelMap(
+                                wPixB, int(dSlow1 / nImgPerFr), self._nFr, frames=frRange
+                            ))
+                        iCh += 1
+                iPixBPerCh = len(iPixBList)
+
+            else:
+                # w/o frame averaging (as usual)
+                # (Standard scan path function was used; each pixel buffer contains
+                #  `pixBLen` pixels for each of the AI channels, one after the other.
+                #  Instead of decoding buffer by buffer, a block of buffers is read at
+                #  once and split into the AI channels by viewing it as a
+                #  (buffer, channel, pixel) array. If only some AI channels are
+                #  loaded, the blocks are still read completely and only the selected
+                #  channels are copied; the blocks of the other channels are too small
+                #  to be skipped efficiently)
+                iChList = None
+                if loadChMask != self.inputChMask:
+                    chList = [i for i in range(SCMIO_maxInputChans) if self.inputChMask & (2 ** i)]
+                    iChList = [iCh for iCh, iInCh in enumerate(chList) if loadChMask & (2 ** iInCh)]
+                npx = int(pixBLen * nAICh)
+                if workers <= 1 and readAhead > 0:
+                    # Smaller blocks, so that reading and splitting overlap
+                    # also for smaller files
+                    blockSize_bytes = SCMIO_readAheadBlockSize_bytes
+                else:
+                    blockSize_bytes = SCMIO_readBlockSize_bytes
+                nPixBPerBlock = max(1, blockSize_bytes // (npx * self.pixSize_byte))
+                if workers > 1:
+                    # At least one block per thread
+                    nPixBPerBlock = min(nPixBPerBlock, -(-len(iPixBList) // workers))
+                wPixDataCh = self._wPixData
+
+                blockList = self._getPixBufBlockList(iPixBList, nPixBPerBlock)
+                iPixBPerCh = len(iPixBList)
+
+                def readBlocks(blocks):
+                    # Read blocks of pixel buffers (containing all AI channels) with
+                    # an own file handle and block buffer
+                    wPixBAllCh = np.zeros((nPixBPerBlock, nAICh, pixBLen), _dtype)
+                    with open(fPathSMP, "rb", buffering=0) as fu:
+                        for iPixB, nb, iPixBPerCh in blocks:
+                            self._readPixBufBlock(fu, lay, iPixB, nb, wPixBAllCh)
+                            self._splitPixBufBlock(wPixBAllCh, nb, iPixBPerCh, wPixDataCh, iChList)
+
+                t0 = time.perf_counter()
+                if workers > 1 and len(blockList) > 1:
+                    # Read disjoint parts of the file in parallel; each thread
+                    # writes into different buffers of the pixel data waves
+                    nThr = min(workers, len(blockList))
+                    n = len(blockList)
+                    with ThreadPoolExecutor(max_workers=nThr) as pool:
+                        list(pool.map(
+                            readBlocks,
+                            [blockList[i * n // nThr:(i + 1) * n // nThr] for i in range(nThr)]
+                        ))
+                elif readAhead > 0 and len(blockList) > 1:
+                    self._readPixBufBlocksAhead(
+                        fPathSMP, lay, blockList, nPixBPerBlock, readAhead, wPixDataCh, iChList
+                    )
+                else:
+                    readBlocks(blockList)
+                self._setReadStats(
+                    iPixBPerCh * npx * self.pixSize_byte, time.perf_counter() - t0
+                )
 
             # Done reading
-            scm_log(f"{iPixBPerCh + 1} pixel bufs of {nPixB} read.")
+            scm_log(f"{iPixBPerCh} pixel bufs of {nPixB} {'mapped' if mmap else 'read'}.")
 
             # Post-process data waves according to user settings
-            isFirst = 1
-            for iInCh in range(SCMIO_maxInputChans):
-                if self.inputChMask & (2 ** iInCh):
-
-                    # Reshape AI channel pixel waves
-                    errC = ERR_Ok
-                    if self.scanMode in [ScM_scanMode_XYImage, ScM_scanMode_XZYImage, ScM_scanMode_ZXYImage]:
-                        j = 0
-                        while not self._wPixData[j][0] == iInCh and j < SCMIO_maxInputChans: j += 1
-                        try:
-                            self._wPixData[j][1].shape = (self._nFr, int(dSlow1 / nImgPerFr), dFast)
-                        except ValueError:
-                            errC = ERR_CannotReshapePixelData
-                    # ***************
-                    # ***************
-                    # TODO
-                    elif self.scanMode == ScM_scanMode_TrajectArb:
-                        errC = ERR_NotImplemented
-                        '''
+            # (Reshape the pixel data of all AI channels at once)
+            errC = ERR_Ok
+            if mmap:
+                # Channel maps already have their (frame, line, pixel) shape
+                pass
+            elif self.scanMode in [ScM_scanMode_XYImage, ScM_scanMode_XZYImage, ScM_scanMode_ZXYImage]:
+                try:
+                    self._wPixData = self._getFrames(self._wPixData, lay, iPixFrStart)
+                except ValueError:
+                    errC = ERR_CannotReshapePixelData
+            # ***************
+            # ***************
+            # TODO
+            elif self.scanMode == ScM_scanMode_TrajectArb:
+                errC = ERR_NotImplemented
+                '''
             // Just a quick fix; TODO ==>
             nFr = (nPixB/nFrPerStep*PixBLen) /(nPixPerFr) *nImgPerFr
             Redimension/E=1/N=(dFast, dSlow1/nImgPerFr, nFr) pwPixData
             '''
-                    elif self.scanMode == ScM_scanMode_XYZImage:
-                        errC = ERR_NotImplemented
-                    # ***************
-                    # ***************
-                    else:
-                        errC = ERR_UnknownScanCode
-
-                    if errC != ERR_Ok:
-                        s = "ERROR: " + ERRStr[errC]
-                        if errC == ERR_NotImplemented:
-                            s = s.format(ScM_scanModeStr[self.scanMode])
-                        scm_log(s)
-                        return errC
+            elif self.scanMode == ScM_scanMode_XYZImage:
+                errC = ERR_NotImplemented
+            # ***************
+            # ***************
+            else:
+                errC = ERR_UnknownScanCode
+
+            if errC != ERR_Ok:
+                s = "ERROR: " + ERRStr[errC]
+                if errC == ERR_NotImplemented:
+                    s = s.format(ScM_scanModeStr[self.scanMode])
+                scm_log(s)
+                return errC
 
             # Save some variables for later use in properties and such
             self._dFast = dFast
@@ -380,6 +495,7 @@ class SMP(SMH):
             self._nFastPixOff = int(nFastPixOff)
             self._dSlow1 = dSlow1
             self._dSlow2 = dSlow2
+            self._frRange = frRange
 
             self._isSMPReady = True
             scm_log("Done.")
@@ -388,25 +504,397 @@ class SMP(SMH):
             raise
         return errC
 
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    @staticmethod
+    def _getPixBufList(lay, frRange):
+        """ Returns the indices of the pixel buffers that contain the frames in `frRange`
+        and, for each of these frames, the position of its first pixel in the pixel
+        data read from these buffers
+    """
+        pixBLen, nPixPerFr = lay["pixBLen"], lay["nPixPerFr"]
+        wFr = np.asarray(frRange, dtype=np.int64)
+        iPixBFirst = wFr * nPixPerFr // pixBLen
+        nPixBPerFr = -(-(wFr + 1) * nPixPerFr // pixBLen) - iPixBFirst
+        iPixBList = np.repeat(iPixBFirst - np.cumsum(nPixBPerFr) + nPixBPerFr, nPixBPerFr)
+        iPixBList = np.unique(iPixBList + np.arange(len(iPixBList)))
+        iPixFrStart = np.searchsorted(iPixBList, iPixBFirst) * pixBLen + wFr * nPixPerFr % pixBLen
+        return iPixBList, iPixFrStart
+
+    @staticmethod
+    def _getPixBufBlockList(iPixBList, nPixBPerBlock):
+        """ Split the runs of consecutive pixel buffers in `iPixBList` into blocks of
+        at most `nPixBPerBlock` buffers; returns the blocks as list of (first buffer
+        in file, number of buffers, first buffer in the pixel data waves)
+    """
+        blockList = []
+        iPixBPerCh = 0
+        for iPixBRun in np.split(iPixBList, np.flatnonzero(np.diff(iPixBList) != 1) + 1):
+            for j in range(0, len(iPixBRun), nPixBPerBlock):
+                nb = min(nPixBPerBlock, len(iPixBRun) - j)
+                blockList.append((int(iPixBRun[j]), nb, iPixBPerCh))
+                iPixBPerCh += nb
+        return blockList
+
+    @staticmethod
+    def _getFrames(wPixData, lay, iPixFrStart):
+        """ Returns the (frame, line, pixel) array of the frames starting at `iPixFrStart`
+        in the (buffer, pixel) pixel data `wPixData` of one AI channel, or the
+        (channel, frame, line, pixel) array for the (channel, buffer, pixel) pixel data
+        of several; pixels of the pixel buffers that do not belong to these frames (if
+        any) are dropped
+    """
+        nFr, nPixPerFr = len(iPixFrStart), lay["nPixPerFr"]
+        nLead = wPixData.shape[:-2]
+        wPixData = wPixData.reshape(nLead + (-1,))
+        if np.array_equal(iPixFrStart, iPixFrStart[0] + np.arange(nFr) * nPixPerFr):
+            w = wPixData[..., iPixFrStart[0]:iPixFrStart[0] + nFr * nPixPerFr]
+        else:
+            w = wPixData[..., iPixFrStart[:, np.newaxis] + np.arange(nPixPerFr)]
+        return w.reshape(nLead + (nFr, int(lay["dSlow1"] / lay["nImgPerFr"]), lay["dFast"]))
+
+    def _readPixBufBlock(self, fu, lay, iPixB, nb, wPixBAllCh):
+        """ Read the `nb` consecutive pixel buffers starting at `iPixB` from the
+        (unbuffered) pixel data file `fu` into the block buffer `wPixBAllCh`, a
+        (buffer, channel, pixel) array
+    """
+        bufLen_byte = lay["nAICh"] * lay["pixBLen"] * self.pixSize_byte
+        fu.seek(iPixB * bufLen_byte)
+        nRead = scm_readinto(fu, wPixBAllCh[:nb])
+        eof = nRead < nb * bufLen_byte
+        if eof:
+            # End of file reached ...
+            assert False, "ABORT: End of .smp file, should not happen ..."
+
+    @staticmethod
+    def _splitPixBufBlock(wPixBAllCh, nb, iPixBPerCh, wPixDataCh, iChList=None):
+        """ Copy the AI channels (all, or those at positions `iChList`) of the first
+        `nb` pixel buffers in the block buffer `wPixBAllCh`, a (buffer, channel, pixel)
+        array, into the buffers starting at `iPixBPerCh` of the (channel, buffer, pixel)
+        array `wPixDataCh`
+    """
+        if iChList is None:
+            wPixDataCh[:, iPixBPerCh:iPixBPerCh + nb] = wPixBAllCh[:nb].transpose(1, 0, 2)
+        else:
+            for j, iCh in enumerate(iChList):
+                wPixDataCh[j, iPixBPerCh:iPixBPerCh + nb] = wPixBAllCh[:nb, iCh]
+
+    def _readPixBufBlocksAhead(self, fPath, lay, blockList, nPixBPerBlock, nAhead, wPixDataCh,
+                               iChList=None):
+        """ Read the blocks in `blockList` in a background thread into a ring of
+        `nAhead` +1 preallocated block buffers, while the blocks already read are
+        split into the AI channels (see `_splitPixBufBlock`) in `wPixDataCh`
+    """
+        shape = (nPixBPerBlock, lay["nAICh"], lay["pixBLen"])
+        nBuf_byte = int(np.prod(shape)) * self.pixSize_byte
+        qFree = queue.Queue()
+        qFull = queue.Queue()
+        for _ in range(nAhead + 1):
+            qFree.put(np.frombuffer(bytearray(nBuf_byte), dtype=lay["dtype"]).reshape(shape))
+        isAborted = threading.Event()
+
+        def reader():
+            try:
+                with open(fPath, "rb", buffering=0) as fu:
+                    for block in blockList:
+                        wPixBAllCh = qFree.get()
+                        if isAborted.is_set():
+                            return
+                        self._readPixBufBlock(fu, lay, block[0], block[1], wPixBAllCh)
+                        qFull.put((block, wPixBAllCh))
+            except BaseException as e:
+                qFull.put((None, e))
+
+        thr = threading.Thread(target=reader, daemon=True)
+        thr.start()
+        try:
+            for _ in range(len(blockList)):
+                block, wPixBAllCh = qFull.get()
+                if block is None:
+                    # Re-raise errors of the reader thread
+                    raise wPixBAllCh
+                self._splitPixBufBlock(wPixBAllCh, block[1], block[2], wPixDataCh, iChList)
+                qFree.put(wPixBAllCh)
+        finally:
+            # Release the reader, in case it waits for a free block buffer
+            isAborted.set()
+            qFree.put(None)
+            thr.join()
+
+    def _setReadStats(self, nRead_byte, dt_s):
+        """ Keep and log the number of bytes read from the pixel data file and the
+        achieved throughput
+    """
+        MBps = nRead_byte / 2 ** 20 / dt_s if dt_s > 0 else float("inf")
+        self._readStatsDict = {"bytes": nRead_byte, "seconds": dt_s, "MBps": MBps}
+        scm_log(f"{nRead_byte / 2 ** 20:.1f} MB read in {dt_s:.3f} s ({MBps:.1f} MB/s)")
+
+    def _readPixBufs(self, fu, lay, iPixBList, iChList, wPixDataCh):
+        """ Read the pixel buffers `iPixBList` from the (unbuffered) pixel data file `fu`
+        in blocks of consecutive buffers and copy the AI channels at positions `iChList`
+        into the respective channel of the (channel, buffer, pixel) array `wPixDataCh`
+    """
+        bufLen_byte = lay["nAICh"] * lay["pixBLen"] * self.pixSize_byte
+        nPixBPerBlock = max(1, min(SCMIO_readBlockSize_bytes // bufLen_byte, len(iPixBList)))
+        wPixBAllCh = np.zeros((nPixBPerBlock, lay["nAICh"], lay["pixBLen"]), lay["dtype"])
+        for iPixB, nb, iPixBPerCh in self._getPixBufBlockList(iPixBList, nPixBPerBlock):
+            self._readPixBufBlock(fu, lay, iPixB, nb, wPixBAllCh)
+            self._splitPixBufBlock(wPixBAllCh, nb, iPixBPerCh, wPixDataCh, iChList)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def iter_frames(self, ch=0, chunk=100, crop=True):
+        """ Iterate over the frames of AI channel `ch` in blocks of `chunk` frames
+
+        Yields the index of the first frame in the block and the block as
+        (frame, line, pixel) array, cropped to the imaging region if `crop` is True.
+        If `ch` is a list of AI channels, the pixel data is read once for all of
+        them and the blocks are (channel, frame, line, pixel) arrays.
+        Only the pixel data of the current block is read, hence memory use does not
+        depend on the length of the recording. Does not require `loadSMP`.
+    """
+        if not self._isSMHReady:
+            scm_log(f"ERROR: Load `.smh` file first")
+            return
+        fPathSMP = self._fPath + "." + SCMIO_pixelDataFileExtStr
+        if not os.path.exists(fPathSMP):
+            scm_log(f"ERROR: File `{fPathSMP}` not found")
+            return
+        if not (self.scanMode in [ScM_scanMode_XYImage]):
+            scm_log("ERROR: " + ERRStr[ERR_NotImplemented].format(ScM_scanModeStr[self.scanMode]))
+            return
+        errC, lay = self._getPixDataLayout()
+        if errC != ERR_Ok:
+            return
+        if lay["isAvZStack"] or StimBuf(self).isExtScanFunction:
+            scm_log("ERROR: " + ERRStr[ERR_NotImplemented].format("Z-stacks/external decoders"))
+            return
+        chList = list(ch) if isinstance(ch, (list, tuple)) else [ch]
+        for c in chList:
+            if not self.inputChMask & (2 ** c):
+                scm_log("ERROR: " + ERRStr[ERR_ChannelNotRecorded].format(c))
+                return
+
+        # Positions of the AI channels in the pixel buffers
+        iChList = [bin(self.inputChMask & (2 ** c - 1)).count("1") for c in chList]
+        x0 = lay["nFastPixOff"] if crop else 0
+        x1 = lay["dFast"] - lay["nFastPixRetr"] if crop else lay["dFast"]
+
+        with open(fPathSMP, "rb", buffering=0) as fu:
+            for iFr in range(0, lay["nFr"], chunk):
+                frRange = range(iFr, min(iFr + chunk, lay["nFr"]))
+                iPixBList, iPixFrStart = self._getPixBufList(lay, frRange)
+                wPixB = np.zeros((len(iChList), len(iPixBList), lay["pixBLen"]), lay["dtype"])
+                self._readPixBufs(fu, lay, iPixBList, iChList, wPixB)
+                w = self._getFrames(wPixB, lay, iPixFrStart)[..., x0:x1]
+                yield iFr, w if isinstance(ch, (list, tuple)) else w[0]
+
+    def getTriggerEvents(self, ch=2, threshold=20000, minGap_s=0.0, chunk=100):
+        """ Detect trigger events in AI channel `ch`, i.e. the pixels at which the
+        signal rises to or above `threshold`; events less than `minGap_s` after
+        the previous event are ignored. The pixel data is streamed in blocks of
+        `chunk` frames (see `iter_frames`), hence it does not need to be loaded.
+        Returns the events as array of `SCMIO_triggerEventDType` (frame, line and
+        pixel in the uncropped frame, time from the pixel duration), or None
+    """
+        errC, info = self.probe()
+        if errC != ERR_Ok:
+            scm_log("ERROR: " + ERRStr[errC])
+            return None
+        if ch not in info["channels"]:
+            scm_log("ERROR: " + ERRStr[ERR_ChannelNotRecorded].format(ch))
+            return None
+
+        _, nY, nX = info["shape"]
+        pixDur_s = self.pixDur_us * 1e-6
+        iPixList = []
+        tLast_s = -np.inf
+        isHigh = False
+        for iFr, block in self.iter_frames(ch=ch, chunk=chunk, crop=False):
+            # Rising edges, including one from the previous block
+            high = block.reshape(-1) >= threshold
+            iOn = np.flatnonzero(high[1:] & ~high[:-1]) + 1
+            if high[0] and not isHigh:
+                iOn = np.concatenate(([0], iOn))
+            isHigh = high[-1]
+            for iPix in (iOn + iFr * nY * nX).tolist():
+                if iPix * pixDur_s - tLast_s >= minGap_s:
+                    iPixList.append(iPix)
+                    tLast_s = iPix * pixDur_s
+
+        iPix = np.array(iPixList, dtype=np.int64)
+        events = np.zeros(len(iPix), dtype=SCMIO_triggerEventDType)
+        events["frame"], iPixFr = np.divmod(iPix, nY * nX)
+        events["line"], events["pixel"] = np.divmod(iPixFr, nX)
+        events["time_s"] = iPix * pixDur_s
+        return events
+
+    def saveReduced(self, fName, channels=None, frames=None):
+        """ Write a new `.smh`/`.smp` file pair `fName` that only contains the AI
+        channels `channels` (e.g. `[2]`) and the frames `frames` (a slice w/ step 1,
+        that starts and ends at a pixel buffer boundary) of this recording, and
+        can be loaded like any ScanM file. The pixel buffers are streamed from the
+        pixel data file, hence only the `.smh` file needs to be loaded; the new
+        file pair gets its own GUID. Returns an error code
+    """
+        if not self._isSMHReady:
+            scm_log(f"ERROR: Load `.smh` file first")
+            return ERR_InvalidSMHObject
+        fPathSMP = self._fPath + "." + SCMIO_pixelDataFileExtStr
+        if not os.path.exists(fPathSMP):
+            scm_log(f"ERROR: File `{fPathSMP}` not found")
+            return ERR_FileNotFound
+        if not (self.scanMode in [ScM_scanMode_XYImage]):
+            scm_log("ERROR: " + ERRStr[ERR_NotImplemented].format(ScM_scanModeStr[self.scanMode]))
+            return ERR_NotImplemented
+        errC, lay = self._getPixDataLayout()
+        if errC != ERR_Ok:
+            return errC
+        if lay["isAvZStack"] or StimBuf(self).isExtScanFunction:
+            scm_log("ERROR: " + ERRStr[ERR_NotImplemented].format("Z-stacks/external decoders"))
+            return ERR_NotImplemented
+        pixBLen, nPixPerFr = lay["pixBLen"], lay["nPixPerFr"]
+
+        # Positions of the selected AI channels in the pixel buffers
+        chList = [iInCh for iInCh in range(SCMIO_maxInputChans) if self.inputChMask & (2 ** iInCh)]
+        channels = chList if channels is None else sorted(set(channels))
+        for ch in channels:
+            if ch not in chList:
+                scm_log("ERROR: " + ERRStr[ERR_ChannelNotRecorded].format(ch))
+                return ERR_ChannelNotRecorded
+        iChList = [chList.index(ch) for ch in channels]
+
+        # Pixel buffers of the selected frames
+        iPixB0, nPixBOut = 0, lay["nPixB"]
+        if frames is not None:
+            frRange = range(lay["nFr"])[frames]
+            if (len(frRange) == 0 or frRange.step != 1 or
+                    (frRange.start * nPixPerFr) % pixBLen or (len(frRange) * nPixPerFr) % pixBLen or
+                    len(frRange) % max(1, self.nStimBufPerFr)):
+                scm_log("ERROR: " + ERRStr[ERR_InvalidFrameRange].format(frames))
+                return ERR_InvalidFrameRange
+            iPixB0 = frRange.start * nPixPerFr // pixBLen
+            nPixBOut = len(frRange) * nPixPerFr // pixBLen
+
+        # Update the key-value pairs
+        lines = []
+        for sLn in scm_read_header_lines(self._fPath + "." + SCMIO_headerFileExtStr):
+            sKey = scm_get_entry_key(sLn)
+            if sKey == SCMIO_keys.InputChannelMask.value:
+                sLn = scm_set_entry_value(sLn, sum(2 ** ch for ch in channels))
+            elif frames is not None and sKey in [
+                    SCMIO_keys.NumberOfFrames.value, SCMIO_keys.NumberOfPixBufsSet.value]:
+                # (the loader prefers the pixel buffer counts, if present)
+                sLn = scm_set_entry_value(sLn, len(frRange) // max(1, self.nStimBufPerFr))
+            elif frames is not None and sKey in [
+                    SCMIO_keys.FrameCounter.value, SCMIO_keys.PixBufCounter.value]:
+                sLn = scm_set_entry_value(sLn, 0)
+            else:
+                # Pixel buffer lengths are numbered continuously over the AI channels
+                for iCh in range(len(chList)):
+                    if sKey == SCMIO_key_InputCh_x_PixBufLen.format(iCh):
+                        if iCh not in iChList:
+                            sLn = None
+                        else:
+                            sKeyNew = SCMIO_key_InputCh_x_PixBufLen.format(iChList.index(iCh))
+                            sLn = sLn.replace(sKey, sKeyNew, 1)
+                        break
+            if sLn is not None:
+                lines.append(sLn)
+
+        # Stream the selected AI channels of the pixel buffers into the new file
+        fPathOut = os.path.splitext(fName)[0]
+        nPixBPerBlock = max(1, SCMIO_readBlockSize_bytes // (lay["nAICh"] * pixBLen * self.pixSize_byte))
+        wPixBAllCh = np.zeros((nPixBPerBlock, lay["nAICh"], pixBLen), lay["dtype"])
+        isAllCh = iChList == list(range(lay["nAICh"]))
+        with open(fPathSMP, "rb", buffering=0) as fu, \
+                open(fPathOut + "." + SCMIO_pixelDataFileExtStr, "wb") as fo:
+            for iPixB in range(iPixB0, iPixB0 + nPixBOut, nPixBPerBlock):
+                nb = min(nPixBPerBlock, iPixB0 + nPixBOut - iPixB)
+                self._readPixBufBlock(fu, lay, iPixB, nb, wPixBAllCh)
+                fo.write(wPixBAllCh[:nb] if isAllCh else wPixBAllCh[:nb, iChList])
+
+            # Write header and append the post-header w/ the same (new) GUID
+            d = dict(self._SMHPreHdrDict)
+            d["GUID"] = uuid.uuid4().hex
+            d["pixDataLen_byte"] = nPixBOut * len(iChList) * pixBLen * self.pixSize_byte
+            d["analogDataLen_byte"] = d["pixDataLen_byte"]
+            d = scm_write_header(fPathOut + "." + SCMIO_headerFileExtStr, d, lines)
+            fo.write(scm_pack_pre_header(d, "SMP"))
+
+        scm_log(f"{nPixBOut} pixel bufs with {len(iChList)} AI channel(s) written to `{fPathOut}`")
+        return ERR_Ok
+
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
     @property
     def isSMPReady(self):
         return self._isSMPReady
 
-    def getData(self, ch=0, crop=False):
-        # Return data for the AIn channel `ch` or None, if channel does not exist.
+    @property
+    def channels(self):
+        # List of the loaded AI channels
+        return list(self._chIndexDict) if self._isSMPReady else []
+
+    @property
+    def frames(self):
+        # Range of the loaded frames
+        return self._frRange
+
+    @property
+    def readStats(self):
+        # Bytes read, seconds and throughput (MB/s) of the last `loadSMP`
+        return self._readStatsDict
+
+    def describe(self):
+        """ Print the recording geometry and the expected sizes, as derived from the
+        header and the pixel data file size (see `probe`); returns the dict of `probe`
+        or None, if the pixel data file cannot be probed
+    """
+        errC, info = self.probe()
+        if info is None:
+            return None
+        MB = 2 ** 20
+        print(f"Recording")
+        print(f"---------")
+        print(f"Frames  : count        : {info['nFr']} ({info['nFrInFile']} in file)")
+        print(f"          shape        : {info['shape']}, {info['dtype']}")
+        print(f"          cropped      : {info['croppedShape']}")
+        print(f"Input   : channels     : {info['channels']}")
+        print(f"          per channel  : {info['bytesPerChannel'] / MB:.1f} MB"
+              f" ({info['croppedBytesPerChannel'] / MB:.1f} MB cropped)")
+        s = "complete" if info["isComplete"] else "TRUNCATED"
+        print(f"File    : size         : {info['fileSize_byte'] / MB:.1f} MB, {s}")
+        return info
+
+    def getData(self, ch=0, crop=False, frames=None):
+        # Return data for the AIn channel `ch` or None, if channel does not exist
+        # or was not loaded (see `channels` in `loadSMP`).
         # if `crop` is True, then crop to imaging region
-        for j in range(SCMIO_maxInputChans):
-            if self._wPixData[j][0] == ch:
-                if not crop:
-                    return self._wPixData[j][1]
-                else:
-                    if self.scanMode in [
-                        ScM_scanMode_XYImage, ScM_scanMode_XZYImage, ScM_scanMode_ZXYImage
-                    ]:
-                        return self._wPixData[j][1][:, :, self._nFastPixOff:-self._nFastPixRetr]
-                    else:
-                        assert False, "ABORT: Should not happen"
-        return None
+        # `frames` optionally selects frames (e.g. `slice(0, 100)`) among the
+        # loaded ones (see `frames` in `loadSMP`)
+        frames = slice(None) if frames is None else frames
+        j = self._chIndexDict.get(ch) if self._isSMPReady else None
+        if j is None:
+            return None
+        if not crop:
+            return self._wPixData[j][frames]
+        else:
+            if self.scanMode in [
+                ScM_scanMode_XYImage, ScM_scanMode_XZYImage, ScM_scanMode_ZXYImage
+            ]:
+                return self._wPixData[j][frames, :, self._nFastPixOff:self._dFast - self._nFastPixRetr]
+            else:
+                assert False, "ABORT: Should not happen"
+
+    def getAllData(self, crop=False, frames=None):
+        # Return data of all loaded AI channels as (channel, frame, line, pixel)
+        # array, in the order of `channels`, or None if no data was loaded; a view
+        # into the loaded pixel data (memory-mapped channels are read)
+        # `crop` and `frames` as in `getData`
+        if not self._isSMPReady:
+            return None
+        frames = slice(None) if frames is None else frames
+        x = slice(self._nFastPixOff, self._dFast - self._nFastPixRetr) if crop else slice(None)
+        if isinstance(self._wPixData, list):
+            return np.stack([np.asarray(m[frames, :, x]) for m in self._wPixData])
+        return self._wPixData[:, frames, :, x]
 
     # -------------------------------------------------------------------------------------------